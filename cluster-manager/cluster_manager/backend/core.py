@@ -4,16 +4,19 @@ Core application infrastructure: config, logging, utilities, dependencies, and b
 
 from __future__ import annotations
 
+import hashlib
 import logging
 import os
-from collections.abc import Callable
+import threading
+import time
+from collections.abc import Callable, Hashable
 from contextlib import AbstractAsyncContextManager, asynccontextmanager
 from pathlib import Path
-from typing import Annotated, ClassVar, TypeAlias
+from typing import Annotated, Any, ClassVar, TypeAlias
 
 from databricks.sdk import WorkspaceClient
 from dotenv import load_dotenv
-from fastapi import APIRouter, Depends, FastAPI, Header, Request
+from fastapi import APIRouter, Depends, FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
@@ -95,6 +98,130 @@ except Exception as e:
 # --- Utils ---
 
 
+class TTLCache:
+    """Small thread-safe in-memory cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, ttl: float, maxsize: int = 128) -> None:
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: dict[Hashable, tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default if missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store value under key, evicting the oldest entry when full."""
+        with self._lock:
+            if key not in self._data and len(self._data) >= self.maxsize:
+                self._data.pop(next(iter(self._data)))
+            self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def pop(self, key: Hashable) -> None:
+        """Invalidate a single entry."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Invalidate all entries."""
+        with self._lock:
+            self._data.clear()
+
+
+# Auto-discovered SQL warehouse per workspace host, shared by every router that
+# runs statements; kept for 60s so a newly started warehouse is picked up quickly,
+# and dropped on warehouse errors so a stopped or deleted one is replaced
+_warehouse_cache = TTLCache(ttl=60, maxsize=8)
+
+
+def _is_serverless(wh) -> bool:
+    """Check if a warehouse is serverless."""
+    # Check enable_serverless_compute flag
+    if getattr(wh, 'enable_serverless_compute', False):
+        return True
+    # Check warehouse_type (PRO warehouses are serverless-capable)
+    wh_type = getattr(wh, 'warehouse_type', None)
+    if wh_type and str(wh_type.value).upper() == "PRO":
+        return True
+    return False
+
+
+def get_warehouse_id(ws: WorkspaceClient, config: AppConfig) -> str:
+    """Get SQL warehouse ID from config or find a suitable one.
+
+    Priority:
+    1. Configured warehouse ID
+    2. Running serverless warehouse (instant)
+    3. Running regular warehouse
+    4. Stopped serverless warehouse (starts quickly)
+    5. Any available warehouse (may need to wait for startup)
+
+    Discovered warehouses are cached per workspace until the TTL expires or
+    invalidate_warehouse() is called.
+    """
+    if config.sql_warehouse_id:
+        return config.sql_warehouse_id
+
+    cached = _warehouse_cache.get(ws.config.host)
+    if cached is not None:
+        return cached
+
+    warehouse_id = _discover_warehouse_id(ws)
+    _warehouse_cache.set(ws.config.host, warehouse_id)
+    return warehouse_id
+
+
+def invalidate_warehouse(ws: WorkspaceClient) -> None:
+    """Forget the discovered warehouse so the next statement re-discovers one."""
+    _warehouse_cache.pop(ws.config.host)
+
+
+def _discover_warehouse_id(ws: WorkspaceClient) -> str:
+    """List warehouses and pick the best one per the priority in get_warehouse_id."""
+    warehouses = list(ws.warehouses.list())
+
+    serverless_warehouses = [wh for wh in warehouses if _is_serverless(wh)]
+    regular_warehouses = [wh for wh in warehouses if not _is_serverless(wh)]
+
+    # 1. Try running serverless warehouse first (best option)
+    for wh in serverless_warehouses:
+        if wh.state and wh.state.value == "RUNNING":
+            logger.info(f"Using running serverless warehouse: {wh.name} ({wh.id})")
+            return wh.id
+
+    # 2. Try any running warehouse
+    for wh in regular_warehouses:
+        if wh.state and wh.state.value == "RUNNING":
+            logger.info(f"Using running warehouse: {wh.name} ({wh.id})")
+            return wh.id
+
+    # 3. Try stopped serverless warehouse (starts quickly)
+    for wh in serverless_warehouses:
+        if wh.state and wh.state.value in ("STOPPED", "STOPPING"):
+            logger.info(f"Using serverless warehouse (will auto-start): {wh.name} ({wh.id})")
+            return wh.id
+
+    # 4. Fall back to any available warehouse
+    if warehouses:
+        wh = warehouses[0]
+        logger.info(f"Using warehouse (may need startup): {wh.name} ({wh.id})")
+        return wh.id
+
+    raise HTTPException(
+        status_code=500,
+        detail="No SQL warehouse available. Configure CLUSTER_MANAGER_SQL_WAREHOUSE_ID"
+    )
+
+
 def _add_exception_handler(app: FastAPI) -> None:
     """Register a global exception handler."""
 
@@ -228,6 +355,11 @@ def get_ws(request: Request) -> WorkspaceClient:
     return request.app.state.workspace_client
 
 
+# OBO clients keyed by a digest of the forwarded token, so repeat requests from
+# the same user reuse one client (and its HTTP session) without holding raw tokens as keys
+_user_client_cache = TTLCache(ttl=300, maxsize=128)
+
+
 def get_user_ws(
     request: Request,
     token: Annotated[str | None, Header(alias="X-Forwarded-Access-Token")] = None,
@@ -241,9 +373,14 @@ def get_user_ws(
     """
     if token:
         logger.debug("Using OBO token for user authentication")
-        return WorkspaceClient(
-            token=token, auth_type="pat"
-        )  # set pat explicitly to avoid issues with SP client
+        token_key = hashlib.sha256(token.encode()).hexdigest()
+        client = _user_client_cache.get(token_key)
+        if client is None:
+            client = WorkspaceClient(
+                token=token, auth_type="pat"
+            )  # set pat explicitly to avoid issues with SP client
+            _user_client_cache.set(token_key, client)
+        return client
 
     # Fall back to service principal client
     logger.debug("OBO token not available, using service principal client")
@@ -3,7 +3,7 @@
 from datetime import datetime
 from enum import Enum
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 from .. import __version__
 
@@ -42,6 +42,11 @@ class ClusterSource(str, Enum):
     SQL = "SQL"
 
 
+# App enums by their API string value, so unknown SDK values fall back without exceptions
+CLUSTER_STATE_BY_VALUE: dict[str, ClusterState] = {s.value: s for s in ClusterState}
+CLUSTER_SOURCE_BY_VALUE: dict[str, ClusterSource] = {s.value: s for s in ClusterSource}
+
+
 class AutoScaleConfig(BaseModel):
     """Autoscale configuration."""
     min_workers: int
@@ -249,8 +254,16 @@ class ClusterUtilizationMetric(BaseModel):
     is_underutilized: bool = False
 
 
+class ClusterHistoriesRequest(BaseModel):
+    """Request body for fetching utilization history of several clusters at once."""
+    cluster_ids: list[str] = Field(min_length=1, max_length=500)
+    days: int = Field(default=30, ge=1, le=90)
+
+
 class OversizedClusterAnalysis(BaseModel):
     """Analysis of an oversized cluster with recommendations."""
+    model_config = ConfigDict(frozen=True)
+
     cluster_id: str
     cluster_name: str
     cluster_type: ClusterType
@@ -264,6 +277,8 @@ class OversizedClusterAnalysis(BaseModel):
 
 class JobClusterRecommendation(BaseModel):
     """Recommendation to move jobs to an oversized cluster."""
+    model_config = ConfigDict(frozen=True)
+
     source_cluster_id: str
     source_cluster_name: str
     target_cluster_id: str
@@ -286,12 +301,14 @@ class UserConsolidationRecommendation(BaseModel):
 
 class ScheduleOptimizationRecommendation(BaseModel):
     """Recommendation to optimize cluster start/stop times."""
+    model_config = ConfigDict(frozen=True)
+
     cluster_id: str
     cluster_name: str
     current_auto_terminate_minutes: int | None
     recommended_auto_terminate_minutes: int
     avg_idle_time_per_day_minutes: float
-    peak_usage_hours: list[int] = Field(default_factory=list)
+    peak_usage_hours: tuple[int, ...] = ()
     reason: str
 
 
@@ -333,6 +350,8 @@ class SparkConfigSeverity(str, Enum):
 
 class SparkConfigRecommendation(BaseModel):
     """Recommendation for Spark configuration optimization."""
+    model_config = ConfigDict(frozen=True)
+
     cluster_id: str
     cluster_name: str
     setting: str
@@ -346,6 +365,8 @@ class SparkConfigRecommendation(BaseModel):
 
 class ClusterSparkConfigAnalysis(BaseModel):
     """Full Spark configuration analysis for a cluster."""
+    model_config = ConfigDict(frozen=True)
+
     cluster_id: str
     cluster_name: str
     spark_version: str | None
@@ -376,6 +397,8 @@ class CostRecommendationSeverity(str, Enum):
 
 class CostOptimizationRecommendation(BaseModel):
     """Individual cost optimization recommendation."""
+    model_config = ConfigDict(frozen=True)
+
     cluster_id: str
     cluster_name: str
     category: CostOptimizationCategory
@@ -384,11 +407,13 @@ class CostOptimizationRecommendation(BaseModel):
     estimated_savings_percent: float
     severity: CostRecommendationSeverity
     reason: str
-    implementation_steps: list[str] = []
+    implementation_steps: tuple[str, ...] = ()
 
 
 class ClusterCostAnalysis(BaseModel):
     """Full cost optimization analysis for a cluster."""
+    model_config = ConfigDict(frozen=True)
+
     cluster_id: str
     cluster_name: str
     cloud_provider: str  # aws, azure, gcp
@@ -426,6 +451,8 @@ class AutoscalingSeverity(str, Enum):
 
 class AutoscalingRecommendation(BaseModel):
     """Individual autoscaling optimization recommendation."""
+    model_config = ConfigDict(frozen=True)
+
     cluster_id: str
     cluster_name: str
     issue_type: AutoscalingIssueType
@@ -434,11 +461,13 @@ class AutoscalingRecommendation(BaseModel):
     estimated_savings_percent: float
     severity: AutoscalingSeverity
     reason: str
-    implementation_steps: list[str] = []
+    implementation_steps: tuple[str, ...] = ()
 
 
 class ClusterAutoscalingAnalysis(BaseModel):
     """Full autoscaling analysis for a cluster."""
+    model_config = ConfigDict(frozen=True)
+
     cluster_id: str
     cluster_name: str
     cluster_type: ClusterType
@@ -487,6 +516,8 @@ class NodeTypeSeverity(str, Enum):
 
 class NodeTypeRecommendation(BaseModel):
     """Individual node type optimization recommendation."""
+    model_config = ConfigDict(frozen=True)
+
     cluster_id: str
     cluster_name: str
     issue_type: NodeTypeIssueType
@@ -495,11 +526,13 @@ class NodeTypeRecommendation(BaseModel):
     estimated_savings_percent: float
     severity: NodeTypeSeverity
     reason: str
-    implementation_steps: list[str] = []
+    implementation_steps: tuple[str, ...] = ()
 
 
 class NodeTypeSpec(BaseModel):
     """Parsed node type specification."""
+    model_config = ConfigDict(frozen=True)
+
     instance_type: str
     category: NodeTypeCategory
     vcpus: int | None = None
@@ -511,6 +544,8 @@ class NodeTypeSpec(BaseModel):
 
 class ClusterNodeTypeAnalysis(BaseModel):
     """Full node type analysis for a cluster."""
+    model_config = ConfigDict(frozen=True)
+
     cluster_id: str
     cluster_name: str
     cluster_type: ClusterType
@@ -526,3 +561,14 @@ class ClusterNodeTypeAnalysis(BaseModel):
     total_issues: int
     total_potential_savings_percent: float
     recommendations: list[NodeTypeRecommendation]
+
+
+# --- Combined Recommendation Models ---
+
+
+class AllRecommendations(BaseModel):
+    """Spark config, cost and autoscaling analyses returned in one response."""
+
+    spark: list[ClusterSparkConfigAnalysis]
+    cost: list[ClusterCostAnalysis]
+    autoscaling: list[ClusterAutoscalingAnalysis]
@@ -1,16 +1,18 @@
 """Billing API endpoints using Unity Catalog system tables."""
 
+import asyncio
 from datetime import datetime, timedelta, timezone
 from typing import Annotated
 
 from databricks.sdk.service.sql import (
     Disposition,
     Format,
+    StatementParameterListItem,
     StatementState,
 )
 from fastapi import APIRouter, HTTPException, Query
 
-from ..core import Dependency, logger
+from ..core import Dependency, get_warehouse_id, invalidate_warehouse, logger
 from ..models import (
     BillingSummary,
     BillingTrend,
@@ -21,7 +23,13 @@ from ..models import (
 router = APIRouter(prefix="/api/billing", tags=["billing"])
 
 
-def _execute_sql(ws, warehouse_id: str, sql: str, timeout: str = "60s") -> list[dict]:
+def _execute_sql(
+    ws,
+    warehouse_id: str,
+    sql: str,
+    parameters: list[StatementParameterListItem] | None = None,
+    timeout: str = "60s",
+) -> list[dict]:
     """Execute a SQL statement and return results as a list of dicts."""
     logger.info(f"Executing SQL on warehouse {warehouse_id}: {sql[:100]}...")
 
@@ -29,6 +37,7 @@ def _execute_sql(ws, warehouse_id: str, sql: str, timeout: str = "60s") -> list[
         response = ws.statement_execution.execute_statement(
             warehouse_id=warehouse_id,
             statement=sql,
+            parameters=parameters,
             format=Format.JSON_ARRAY,
             disposition=Disposition.INLINE,
             wait_timeout=timeout,
@@ -36,6 +45,9 @@ def _execute_sql(ws, warehouse_id: str, sql: str, timeout: str = "60s") -> list[
     except Exception as e:
         error_msg = str(e)
         logger.error(f"SQL execution error: {error_msg}")
+        if "WAREHOUSE" in error_msg.upper():
+            # The discovered warehouse may be gone or stopped; re-discover next time
+            invalidate_warehouse(ws)
         if "WAREHOUSE" in error_msg.upper() or "timeout" in error_msg.lower():
             raise HTTPException(
                 status_code=503,
@@ -66,75 +78,21 @@ def _execute_sql(ws, warehouse_id: str, sql: str, timeout: str = "60s") -> list[
     # Get column names from manifest
     columns = [col.name for col in response.manifest.schema.columns] if response.manifest else []
 
-    # Convert to list of dicts
-    results = []
-    for row in response.result.data_array:
-        row_dict = {}
-        for i, col_name in enumerate(columns):
-            row_dict[col_name] = row[i] if i < len(row) else None
-        results.append(row_dict)
-
-    return results
-
-
-def _is_serverless(wh) -> bool:
-    """Check if a warehouse is serverless."""
-    # Check enable_serverless_compute flag
-    if getattr(wh, 'enable_serverless_compute', False):
-        return True
-    # Check warehouse_type (PRO warehouses are serverless-capable)
-    wh_type = getattr(wh, 'warehouse_type', None)
-    if wh_type and str(wh_type.value).upper() == "PRO":
-        return True
-    return False
-
-
-def _get_warehouse_id(ws, config) -> str:
-    """Get SQL warehouse ID from config or find a suitable one.
-
-    Priority:
-    1. Configured warehouse ID
-    2. Running serverless warehouse (instant)
-    3. Running regular warehouse
-    4. Stopped serverless warehouse (starts quickly)
-    5. Any available warehouse (may need to wait for startup)
-    """
-    if config.sql_warehouse_id:
-        return config.sql_warehouse_id
-
-    warehouses = list(ws.warehouses.list())
-
-    serverless_warehouses = [wh for wh in warehouses if _is_serverless(wh)]
-    regular_warehouses = [wh for wh in warehouses if not _is_serverless(wh)]
+    return [dict(zip(columns, row)) for row in response.result.data_array]
 
-    # 1. Try running serverless warehouse first (best option)
-    for wh in serverless_warehouses:
-        if wh.state and wh.state.value == "RUNNING":
-            logger.info(f"Using running serverless warehouse: {wh.name} ({wh.id})")
-            return wh.id
 
-    # 2. Try any running warehouse
-    for wh in regular_warehouses:
-        if wh.state and wh.state.value == "RUNNING":
-            logger.info(f"Using running warehouse: {wh.name} ({wh.id})")
-            return wh.id
+def _days_parameter(days: int) -> list[StatementParameterListItem]:
+    """Bind the lookback window so statement text stays constant across requests."""
+    return [StatementParameterListItem(name="days", value=str(days), type="INT")]
 
-    # 3. Try stopped serverless warehouse (starts quickly)
-    for wh in serverless_warehouses:
-        if wh.state and wh.state.value in ("STOPPED", "STOPPING"):
-            logger.info(f"Using serverless warehouse (will auto-start): {wh.name} ({wh.id})")
-            return wh.id
 
-    # 4. Fall back to any available warehouse
-    if warehouses:
-        wh = warehouses[0]
-        logger.info(f"Using warehouse (may need startup): {wh.name} ({wh.id})")
-        return wh.id
-
-    raise HTTPException(
-        status_code=500,
-        detail="No SQL warehouse available. Configure CLUSTER_MANAGER_SQL_WAREHOUSE_ID"
-    )
+def _get_cluster_names(ws) -> dict[str, str | None]:
+    """Map cluster IDs to names; empty if the listing fails so billing data still returns."""
+    try:
+        return {c.cluster_id: c.cluster_name for c in ws.clusters.list()}
+    except Exception as e:
+        logger.warning(f"Failed to get cluster names: {e}")
+        return {}
 
 
 @router.get("/summary", response_model=BillingSummary)
@@ -149,20 +107,20 @@ def get_billing_summary(
     """
     logger.info(f"Getting billing summary for last {days} days")
 
-    warehouse_id = _get_warehouse_id(ws, config)
+    warehouse_id = get_warehouse_id(ws, config)
 
-    sql = f"""
+    sql = """
     SELECT
         COALESCE(SUM(usage_quantity), 0) as total_dbu,
         MIN(usage_date) as period_start,
         MAX(usage_date) as period_end
     FROM system.billing.usage
-    WHERE usage_date >= CURRENT_DATE - INTERVAL {days} DAY
+    WHERE usage_date >= DATE_SUB(CURRENT_DATE(), :days)
         AND usage_metadata.cluster_id IS NOT NULL
     """
 
     try:
-        results = _execute_sql(ws, warehouse_id, sql)
+        results = _execute_sql(ws, warehouse_id, sql, _days_parameter(days))
 
         if not results:
             now = datetime.now(timezone.utc)
@@ -209,7 +167,7 @@ def get_billing_summary(
 
 
 @router.get("/by-cluster", response_model=list[ClusterBillingUsage])
-def get_billing_by_cluster(
+async def get_billing_by_cluster(
     ws: Dependency.Client,
     config: Dependency.Config,
     days: Annotated[int, Query(ge=1, le=90)] = 30,
@@ -221,7 +179,7 @@ def get_billing_by_cluster(
     """
     logger.info(f"Getting billing by cluster for last {days} days")
 
-    warehouse_id = _get_warehouse_id(ws, config)
+    warehouse_id = await asyncio.to_thread(get_warehouse_id, ws, config)
 
     sql = f"""
     SELECT
@@ -230,7 +188,7 @@ def get_billing_by_cluster(
         MIN(usage_date) as usage_start,
         MAX(usage_date) as usage_end
     FROM system.billing.usage
-    WHERE usage_date >= CURRENT_DATE - INTERVAL {days} DAY
+    WHERE usage_date >= DATE_SUB(CURRENT_DATE(), :days)
         AND usage_metadata.cluster_id IS NOT NULL
     GROUP BY usage_metadata.cluster_id
     ORDER BY total_dbu DESC
@@ -238,15 +196,11 @@ def get_billing_by_cluster(
     """
 
     try:
-        results = _execute_sql(ws, warehouse_id, sql)
-
-        # Get cluster names
-        cluster_names = {}
-        try:
-            clusters = list(ws.clusters.list())
-            cluster_names = {c.cluster_id: c.cluster_name for c in clusters}
-        except Exception as e:
-            logger.warning(f"Failed to get cluster names: {e}")
+        # The usage query and the cluster name listing are independent; overlap them
+        results, cluster_names = await asyncio.gather(
+            asyncio.to_thread(_execute_sql, ws, warehouse_id, sql, _days_parameter(days)),
+            asyncio.to_thread(_get_cluster_names, ws),
+        )
 
         usage_list = []
         for row in results:
@@ -298,21 +252,21 @@ def get_billing_trend(
     """
     logger.info(f"Getting billing trend for last {days} days")
 
-    warehouse_id = _get_warehouse_id(ws, config)
+    warehouse_id = get_warehouse_id(ws, config)
 
-    sql = f"""
+    sql = """
     SELECT
         usage_date as date,
         COALESCE(SUM(usage_quantity), 0) as dbu
     FROM system.billing.usage
-    WHERE usage_date >= CURRENT_DATE - INTERVAL {days} DAY
+    WHERE usage_date >= DATE_SUB(CURRENT_DATE(), :days)
         AND usage_metadata.cluster_id IS NOT NULL
     GROUP BY usage_date
     ORDER BY usage_date ASC
     """
 
     try:
-        results = _execute_sql(ws, warehouse_id, sql)
+        results = _execute_sql(ws, warehouse_id, sql, _days_parameter(days))
 
         trend_list = []
         for row in results:
@@ -341,7 +295,7 @@ def get_billing_trend(
 
 
 @router.get("/top-consumers", response_model=list[TopConsumer])
-def get_top_consumers(
+async def get_top_consumers(
     ws: Dependency.Client,
     config: Dependency.Config,
     days: Annotated[int, Query(ge=1, le=90)] = 30,
@@ -353,23 +307,16 @@ def get_top_consumers(
     """
     logger.info(f"Getting top {limit} consumers for last {days} days")
 
-    warehouse_id = _get_warehouse_id(ws, config)
-
-    # First get total
-    total_sql = f"""
-    SELECT COALESCE(SUM(usage_quantity), 0) as total_dbu
-    FROM system.billing.usage
-    WHERE usage_date >= CURRENT_DATE - INTERVAL {days} DAY
-        AND usage_metadata.cluster_id IS NOT NULL
-    """
+    warehouse_id = await asyncio.to_thread(get_warehouse_id, ws, config)
 
-    # Then get by cluster
-    cluster_sql = f"""
+    # The window total is evaluated over every cluster group before LIMIT applies
+    sql = f"""
     SELECT
         usage_metadata.cluster_id as cluster_id,
-        COALESCE(SUM(usage_quantity), 0) as total_dbu
+        COALESCE(SUM(usage_quantity), 0) as total_dbu,
+        COALESCE(SUM(SUM(usage_quantity)) OVER (), 0) as grand_total_dbu
     FROM system.billing.usage
-    WHERE usage_date >= CURRENT_DATE - INTERVAL {days} DAY
+    WHERE usage_date >= DATE_SUB(CURRENT_DATE(), :days)
         AND usage_metadata.cluster_id IS NOT NULL
     GROUP BY usage_metadata.cluster_id
     ORDER BY total_dbu DESC
@@ -377,20 +324,12 @@ def get_top_consumers(
     """
 
     try:
-        # Get total
-        total_results = _execute_sql(ws, warehouse_id, total_sql)
-        total_dbu = float(total_results[0].get("total_dbu") or 0) if total_results else 0
-
-        # Get cluster breakdown
-        cluster_results = _execute_sql(ws, warehouse_id, cluster_sql)
-
-        # Get cluster names
-        cluster_names = {}
-        try:
-            clusters = list(ws.clusters.list())
-            cluster_names = {c.cluster_id: c.cluster_name for c in clusters}
-        except Exception as e:
-            logger.warning(f"Failed to get cluster names: {e}")
+        # Usage breakdown and cluster names are independent; overlap them
+        cluster_results, cluster_names = await asyncio.gather(
+            asyncio.to_thread(_execute_sql, ws, warehouse_id, sql, _days_parameter(days)),
+            asyncio.to_thread(_get_cluster_names, ws),
+        )
+        total_dbu = float(cluster_results[0].get("grand_total_dbu") or 0) if cluster_results else 0
 
         consumers = []
         for row in cluster_results:
@@ -1,6 +1,7 @@
 """Cluster management API endpoints."""
 
 from datetime import datetime, timezone
+from itertools import islice
 from typing import Annotated
 
 from databricks.sdk.service.compute import ClusterDetails, State
@@ -8,6 +9,8 @@ from fastapi import APIRouter, HTTPException, Query
 
 from ..core import Dependency, logger
 from ..models import (
+    CLUSTER_SOURCE_BY_VALUE,
+    CLUSTER_STATE_BY_VALUE,
     AutoScaleConfig,
     ClusterActionResponse,
     ClusterDetail,
@@ -17,6 +20,7 @@ from ..models import (
     ClusterState,
     ClusterSummary,
 )
+from .optimization import invalidate_cluster_listings
 
 router = APIRouter(prefix="/api/clusters", tags=["clusters"])
 
@@ -25,20 +29,14 @@ def _state_to_enum(state: State | None) -> ClusterState:
     """Convert SDK State to our ClusterState enum."""
     if state is None:
         return ClusterState.UNKNOWN
-    try:
-        return ClusterState(state.value)
-    except ValueError:
-        return ClusterState.UNKNOWN
+    return CLUSTER_STATE_BY_VALUE.get(state.value, ClusterState.UNKNOWN)
 
 
 def _source_to_enum(source: str | None) -> ClusterSource | None:
     """Convert SDK source string to our ClusterSource enum."""
     if source is None:
         return None
-    try:
-        return ClusterSource(source)
-    except ValueError:
-        return None
+    return CLUSTER_SOURCE_BY_VALUE.get(source)
 
 
 def _ms_to_datetime(ms: int | None) -> datetime | None:
@@ -168,13 +166,10 @@ def list_clusters(
     logger.info(f"Listing clusters - limit: {limit}")
 
     try:
-        # Iterate over clusters with limit for performance
-        clusters = []
-        for i, cluster in enumerate(ws.clusters.list()):
-            clusters.append(cluster)
-            if i + 1 >= limit:
-                logger.info(f"Reached limit of {limit} clusters")
-                break
+        # Stop paging once the limit is reached; size pages to match it
+        clusters = list(islice(ws.clusters.list(page_size=limit), limit))
+        if len(clusters) == limit:
+            logger.info(f"Reached limit of {limit} clusters")
 
         logger.info(f"Retrieved {len(clusters)} clusters")
         summaries = [_cluster_to_summary(c) for c in clusters]
@@ -254,6 +249,7 @@ def start_cluster(
             )
 
         ws.clusters.start(cluster_id)
+        invalidate_cluster_listings()
         return ClusterActionResponse(
             success=True,
             message="Cluster start initiated",
@@ -297,6 +293,7 @@ def stop_cluster(
 
         # Use permanent_delete=False to keep cluster configuration
         ws.clusters.delete(cluster_id)
+        invalidate_cluster_listings()
         return ClusterActionResponse(
             success=True,
             message="Cluster stop initiated",
@@ -318,16 +315,15 @@ def get_cluster_events(
 
     try:
         # ws.clusters.events() returns a generator of ClusterEvent objects
-        events = []
-        for i, event in enumerate(ws.clusters.events(cluster_id=cluster_id)):
-            if i >= limit:
-                break
-            events.append(ClusterEvent(
+        events = [
+            ClusterEvent(
                 cluster_id=cluster_id,
                 timestamp=_ms_to_datetime(event.timestamp) or datetime.now(timezone.utc),
                 event_type=event.type.value if event.type else "UNKNOWN",
                 details=event.details.as_dict() if event.details else {},
-            ))
+            )
+            for event in islice(ws.clusters.events(cluster_id=cluster_id), limit)
+        ]
 
         return ClusterEventsResponse(
             events=events,
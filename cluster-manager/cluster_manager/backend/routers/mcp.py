@@ -10,7 +10,7 @@ MCP Protocol Reference: https://modelcontextprotocol.io
 import json
 from typing import Any
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Response
 from pydantic import BaseModel, Field
 
 from ..core import Dependency, logger
@@ -53,8 +53,11 @@ class JsonRpcResponse(BaseModel):
 # - What the tool does and returns
 # - When to use it vs other tools
 # - Example user requests that should trigger this tool
+#
+# Kept as a tuple: the set of tools is fixed at import and shared by the
+# prebuilt tools/list result and discovery payload below.
 
-MCP_TOOLS = [
+MCP_TOOLS = (
     {
         "name": "list_clusters",
         "description": (
@@ -304,7 +307,7 @@ MCP_TOOLS = [
             "required": ["policy_id"],
         },
     },
-]
+)
 
 # Server metadata
 SERVER_INFO = {
@@ -313,6 +316,24 @@ SERVER_INFO = {
     "description": "Databricks Cluster Manager MCP Server - manage clusters via AI agents",
 }
 
+MCP_PROTOCOL_VERSION = "2024-11-05"
+
+# Tool names for O(1) validation; the ordered list is only used in error messages
+_TOOL_NAMES = frozenset(t["name"] for t in MCP_TOOLS)
+_TOOL_NAMES_LIST = [t["name"] for t in MCP_TOOLS]
+
+# Tool metadata is static, so the tools/list result and the discovery
+# payloads are built once at import rather than on every request
+_TOOLS_LIST_RESULT = {"tools": MCP_TOOLS}
+_TOOLS_JSON = json.dumps(
+    {"tools": MCP_TOOLS, "server": SERVER_INFO}, ensure_ascii=False, separators=(",", ":")
+).encode()
+_HEALTH_JSON = json.dumps(
+    {"status": "healthy", "server": SERVER_INFO, "protocol_version": MCP_PROTOCOL_VERSION},
+    ensure_ascii=False,
+    separators=(",", ":"),
+).encode()
+
 
 # --- Tool Execution ---
 
@@ -335,22 +356,10 @@ async def execute_tool(
     logger.info(f"MCP executing tool: {tool_name} with args: {arguments}")
 
     try:
-        if tool_name == "list_clusters":
-            return await _list_clusters(ws, arguments)
-        elif tool_name == "get_cluster":
-            return await _get_cluster(ws, arguments)
-        elif tool_name == "start_cluster":
-            return await _start_cluster(ws, arguments)
-        elif tool_name == "stop_cluster":
-            return await _stop_cluster(ws, arguments)
-        elif tool_name == "get_cluster_events":
-            return await _get_cluster_events(ws, arguments)
-        elif tool_name == "list_policies":
-            return await _list_policies(ws, arguments)
-        elif tool_name == "get_policy":
-            return await _get_policy(ws, arguments)
-        else:
+        handler = _TOOL_HANDLERS.get(tool_name)
+        if handler is None:
             raise ValueError(f"Unknown tool: {tool_name}")
+        return await handler(ws, arguments)
     except Exception as e:
         logger.error(f"MCP tool execution failed: {tool_name} - {e}")
         raise
@@ -429,6 +438,18 @@ async def _get_policy(ws, args: dict) -> dict:
     return policy.model_dump(mode="json")
 
 
+# Tool name -> implementation, used by execute_tool for dispatch
+_TOOL_HANDLERS = {
+    "list_clusters": _list_clusters,
+    "get_cluster": _get_cluster,
+    "start_cluster": _start_cluster,
+    "stop_cluster": _stop_cluster,
+    "get_cluster_events": _get_cluster_events,
+    "list_policies": _list_policies,
+    "get_policy": _get_policy,
+}
+
+
 # --- MCP Protocol Handlers ---
 
 
@@ -437,7 +458,7 @@ def _handle_initialize(request: JsonRpcRequest) -> JsonRpcResponse:
     return JsonRpcResponse(
         id=request.id,
         result={
-            "protocolVersion": "2024-11-05",
+            "protocolVersion": MCP_PROTOCOL_VERSION,
             "capabilities": {
                 "tools": {},
             },
@@ -450,7 +471,7 @@ def _handle_tools_list(request: JsonRpcRequest) -> JsonRpcResponse:
     """Handle MCP tools/list method."""
     return JsonRpcResponse(
         id=request.id,
-        result={"tools": MCP_TOOLS},
+        result=_TOOLS_LIST_RESULT,
     )
 
 
@@ -473,13 +494,12 @@ async def _handle_tools_call(
         )
 
     # Check if tool exists
-    tool_names = [t["name"] for t in MCP_TOOLS]
-    if tool_name not in tool_names:
+    if tool_name not in _TOOL_NAMES:
         return JsonRpcResponse(
             id=request.id,
             error=JsonRpcError(
                 code=-32602,
-                message=f"Unknown tool: {tool_name}. Available tools: {tool_names}",
+                message=f"Unknown tool: {tool_name}. Available tools: {_TOOL_NAMES_LIST}",
             ),
         )
 
@@ -493,7 +513,9 @@ async def _handle_tools_call(
                 "content": [
                     {
                         "type": "text",
-                        "text": json.dumps(result, indent=2, default=str),
+                        # Compact output keeps stdlib json on its C encoder (indent forces
+                        # the pure-Python path) and trims the payload agents read
+                        "text": json.dumps(result, default=str, separators=(",", ":")),
                     }
                 ],
             },
@@ -517,28 +539,8 @@ async def _handle_tools_call(
         )
 
 
-# --- FastAPI Endpoint ---
-
-
-@router.post("", response_model=JsonRpcResponse)
-async def mcp_handler(
-    request: JsonRpcRequest,
-    ws: Dependency.Client,
-) -> JsonRpcResponse:
-    """MCP JSON-RPC 2.0 endpoint.
-
-    This endpoint implements the Model Context Protocol for AI agent integration.
-    It supports the following methods:
-    - initialize: Initialize the MCP connection
-    - tools/list: List available tools
-    - tools/call: Execute a tool
-
-    To use this endpoint from Databricks:
-    1. Create a Unity Catalog HTTP Connection with is_mcp_connection='true'
-    2. Reference the connection in a Supervisor Agent configuration
-    """
-    logger.info(f"MCP request: method={request.method}, id={request.id}")
-
+async def _dispatch(request: JsonRpcRequest, ws) -> JsonRpcResponse:
+    """Route a JSON-RPC request to its MCP method handler."""
     if request.jsonrpc != "2.0":
         return JsonRpcResponse(
             id=request.id,
@@ -568,24 +570,45 @@ async def mcp_handler(
         )
 
 
-@router.get("/tools", response_model=dict)
-async def list_tools() -> dict:
+# --- FastAPI Endpoint ---
+
+
+@router.post("", response_model=None, responses={200: {"model": JsonRpcResponse}})
+async def mcp_handler(
+    request: JsonRpcRequest,
+    ws: Dependency.Client,
+) -> Response:
+    """MCP JSON-RPC 2.0 endpoint.
+
+    This endpoint implements the Model Context Protocol for AI agent integration.
+    It supports the following methods:
+    - initialize: Initialize the MCP connection
+    - tools/list: List available tools
+    - tools/call: Execute a tool
+
+    To use this endpoint from Databricks:
+    1. Create a Unity Catalog HTTP Connection with is_mcp_connection='true'
+    2. Reference the connection in a Supervisor Agent configuration
+    """
+    logger.info(f"MCP request: method={request.method}, id={request.id}")
+
+    # Handlers build a JsonRpcResponse already; serialize it directly instead of
+    # letting FastAPI dump and re-validate it against a response_model
+    response = await _dispatch(request, ws)
+    return Response(content=response.model_dump_json(), media_type="application/json")
+
+
+@router.get("/tools", response_model=None, responses={200: {"model": dict}})
+async def list_tools() -> Response:
     """List available MCP tools (convenience endpoint for debugging).
 
     This is a REST endpoint for easy tool discovery. The actual MCP protocol
     uses the POST endpoint with tools/list method.
     """
-    return {
-        "tools": MCP_TOOLS,
-        "server": SERVER_INFO,
-    }
+    return Response(content=_TOOLS_JSON, media_type="application/json")
 
 
-@router.get("/health", response_model=dict)
-async def mcp_health() -> dict:
+@router.get("/health", response_model=None, responses={200: {"model": dict}})
+async def mcp_health() -> Response:
     """MCP endpoint health check."""
-    return {
-        "status": "healthy",
-        "server": SERVER_INFO,
-        "protocol_version": "2024-11-05",
-    }
+    return Response(content=_HEALTH_JSON, media_type="application/json")
@@ -1,5 +1,6 @@
 """Metrics and analytics API endpoints."""
 
+from collections import Counter
 from datetime import datetime, timezone
 
 from databricks.sdk.service.compute import State
@@ -8,7 +9,6 @@ from fastapi import APIRouter
 from ..core import Dependency, logger
 from ..models import (
     ClusterMetricsSummary,
-    ClusterState,
     IdleClusterAlert,
     OptimizationRecommendation,
 )
@@ -16,16 +16,6 @@ from ..models import (
 router = APIRouter(prefix="/api/metrics", tags=["metrics"])
 
 
-def _state_to_enum(state: State | None) -> ClusterState:
-    """Convert SDK State to our ClusterState enum."""
-    if state is None:
-        return ClusterState.UNKNOWN
-    try:
-        return ClusterState(state.value)
-    except ValueError:
-        return ClusterState.UNKNOWN
-
-
 def _ms_to_datetime(ms: int | None) -> datetime | None:
     """Convert milliseconds timestamp to datetime."""
     if ms is None:
@@ -33,6 +23,17 @@ def _ms_to_datetime(ms: int | None) -> datetime | None:
     return datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
 
 
+def _autoscale_midpoint(cluster) -> float:
+    """Get the worker count for DBU estimates, using the exact (float) autoscale midpoint.
+
+    Unlike the optimization router's integer worker count, a 1-4 autoscale range
+    counts as 2.5 workers, so DBU estimates are not rounded down.
+    """
+    if cluster.autoscale:
+        return (cluster.autoscale.min_workers + cluster.autoscale.max_workers) / 2
+    return cluster.num_workers or 0
+
+
 @router.get("/summary", response_model=ClusterMetricsSummary)
 def get_metrics_summary(ws: Dependency.Client) -> ClusterMetricsSummary:
     """Get a summary of cluster metrics across the workspace.
@@ -43,41 +44,31 @@ def get_metrics_summary(ws: Dependency.Client) -> ClusterMetricsSummary:
 
     clusters = list(ws.clusters.list())
 
-    total_clusters = len(clusters)
-    running_clusters = 0
-    pending_clusters = 0
-    terminated_clusters = 0
+    # Tally states in one C-level pass; only running clusters need per-cluster work
+    state_counts = Counter(cluster.state for cluster in clusters)
     total_running_workers = 0
     estimated_hourly_dbu = 0.0
 
     for cluster in clusters:
-        state = _state_to_enum(cluster.state)
-
-        if state == ClusterState.RUNNING:
-            running_clusters += 1
-            # Count workers
-            if cluster.num_workers:
-                total_running_workers += cluster.num_workers
-            elif cluster.autoscale:
-                # Use current number or average of min/max
-                total_running_workers += (cluster.autoscale.min_workers + cluster.autoscale.max_workers) // 2
-
-            # Estimate DBU (rough: 1 DBU per node per hour)
-            workers = cluster.num_workers or 0
-            if cluster.autoscale:
-                workers = (cluster.autoscale.min_workers + cluster.autoscale.max_workers) / 2
-            estimated_hourly_dbu += (workers + 1)  # +1 for driver
-
-        elif state == ClusterState.PENDING:
-            pending_clusters += 1
-        elif state == ClusterState.TERMINATED:
-            terminated_clusters += 1
+        if cluster.state is not State.RUNNING:
+            continue
+
+        # Count workers
+        if cluster.num_workers:
+            total_running_workers += cluster.num_workers
+        elif cluster.autoscale:
+            # Use current number or average of min/max
+            total_running_workers += (cluster.autoscale.min_workers + cluster.autoscale.max_workers) // 2
+
+        # Estimate DBU (rough: 1 DBU per node per hour)
+        workers = _autoscale_midpoint(cluster)
+        estimated_hourly_dbu += (workers + 1)  # +1 for driver
 
     return ClusterMetricsSummary(
-        total_clusters=total_clusters,
-        running_clusters=running_clusters,
-        pending_clusters=pending_clusters,
-        terminated_clusters=terminated_clusters,
+        total_clusters=len(clusters),
+        running_clusters=state_counts[State.RUNNING],
+        pending_clusters=state_counts[State.PENDING],
+        terminated_clusters=state_counts[State.TERMINATED],
         total_running_workers=total_running_workers,
         estimated_hourly_dbu=estimated_hourly_dbu,
     )
@@ -116,14 +107,12 @@ def get_idle_clusters(ws: Dependency.Client) -> list[IdleClusterAlert]:
 
         if idle_duration >= idle_threshold_minutes:
             # Calculate wasted DBU
-            workers = cluster.num_workers or 0
-            if cluster.autoscale:
-                workers = (cluster.autoscale.min_workers + cluster.autoscale.max_workers) / 2
+            workers = _autoscale_midpoint(cluster)
             dbu_per_hour = workers + 1  # +1 for driver
             wasted_dbu = dbu_per_hour * (idle_duration / 60)
 
             # Determine recommendation
-            auto_terminate = getattr(cluster, 'autotermination_minutes', None)
+            auto_terminate = cluster.autotermination_minutes
             if auto_terminate is None or auto_terminate == 0:
                 recommendation = "Configure auto-termination to prevent idle costs"
             else:
@@ -160,7 +149,7 @@ def get_recommendations(ws: Dependency.Client) -> list[OptimizationRecommendatio
         cluster_name = cluster.cluster_name or "Unnamed Cluster"
 
         # Check 1: No auto-termination configured
-        auto_terminate = getattr(cluster, 'autotermination_minutes', None)
+        auto_terminate = cluster.autotermination_minutes
         if cluster.state == State.RUNNING and (auto_terminate is None or auto_terminate == 0):
             recommendations.append(OptimizationRecommendation(
                 cluster_id=cluster.cluster_id,
@@ -1,23 +1,36 @@
 """Cluster optimization and utilization analysis API endpoints."""
 
+import hashlib
+import heapq
+import re
+import threading
+from collections import defaultdict
+from collections.abc import Iterator
 from datetime import datetime, timedelta, timezone
-from typing import Annotated
+from functools import lru_cache
+from itertools import chain, groupby, islice
+from operator import attrgetter, itemgetter
+from typing import Annotated, Any
 
-from databricks.sdk.service.compute import State
+from databricks.sdk.service.compute import ListClustersFilterBy, State
 from databricks.sdk.service.sql import (
     Disposition,
     Format,
+    StatementParameterListItem,
     StatementState,
 )
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 
-from ..core import Dependency, logger
+from ..core import Dependency, TTLCache, get_warehouse_id, invalidate_warehouse, logger
 from ..models import (
+    AllRecommendations,
     AutoscalingIssueType,
     AutoscalingRecommendation,
     AutoscalingSeverity,
     ClusterAutoscalingAnalysis,
     ClusterCostAnalysis,
+    ClusterHistoriesRequest,
     ClusterNodeTypeAnalysis,
     ClusterSparkConfigAnalysis,
     ClusterType,
@@ -42,18 +55,82 @@ from ..models import (
 
 router = APIRouter(prefix="/api/optimization", tags=["optimization"])
 
+# Computed summaries keyed by (workspace host, cluster fingerprint)
+_SUMMARY_TTL_SECONDS = 30
+_summary_cache = TTLCache(ttl=_SUMMARY_TTL_SECONDS, maxsize=8)
+
+# Cluster listings shared by the analysis endpoints, keyed by (workspace host, limit, states)
+_cluster_list_cache = TTLCache(ttl=30, maxsize=8)
+# One lock per cache key: concurrent misses for the same listing share one API
+# call, while listings for other hosts, limits or state filters proceed in parallel
+_cluster_list_locks: defaultdict[tuple, threading.Lock] = defaultdict(threading.Lock)
+_cluster_list_locks_guard = threading.Lock()
+
+# Per-cluster analyzer results keyed by (analyzer, cluster config signature)
+_analysis_cache = TTLCache(ttl=60, maxsize=512)
+
+# Typical business-hours peak used until per-cluster usage history is available
+_DEFAULT_PEAK_USAGE: tuple[int, ...] = (9, 10, 11, 14, 15, 16)
+
+# Cluster states skipped by the config/cost analyses unless explicitly requested
+_INACTIVE_STATES = frozenset({State.TERMINATED, State.ERROR, State.UNKNOWN})
+# The remaining states, sent to the clusters API as a server-side filter
+_ACTIVE_STATES = tuple(state for state in State if state not in _INACTIVE_STATES)
+
+# Columns read by _row_to_utilization_metric; projecting them keeps any extra
+# table columns off the wire
+_HISTORY_COLUMNS = (
+    "cluster_id, cluster_name, metric_date, cluster_type, worker_count, "
+    "potential_dbu_per_hour, actual_dbu, uptime_hours, efficiency_score, "
+    "job_run_count, unique_users, is_oversized, is_underutilized"
+)
 
-def _execute_sql(ws, warehouse_id: str, sql: str) -> list[dict]:
+# History statements; only the metrics table and the IN-list placeholders vary
+# per request, every value is bound as a statement parameter
+_HISTORY_SQL = f"""
+SELECT {_HISTORY_COLUMNS}
+FROM {{table}}
+WHERE cluster_id = :cluster_id
+    AND metric_date >= DATE_SUB(CURRENT_DATE(), :days)
+ORDER BY metric_date DESC
+"""
+_HISTORIES_SQL = f"""
+SELECT {_HISTORY_COLUMNS}
+FROM {{table}}
+WHERE cluster_id IN ({{placeholders}})
+    AND metric_date >= DATE_SUB(CURRENT_DATE(), :days)
+ORDER BY cluster_id, metric_date DESC
+"""
+
+
+def _metrics_table(config) -> str:
+    """Get the fully qualified cluster utilization metrics table name."""
+    return f"{config.metrics_catalog}.{config.metrics_schema}.cluster_utilization_metrics"
+
+
+def _execute_sql(
+    ws,
+    warehouse_id: str,
+    sql: str,
+    parameters: list[StatementParameterListItem] | None = None,
+) -> list[dict]:
     """Execute a SQL statement and return results as a list of dicts."""
     logger.info(f"Executing SQL: {sql[:100]}...")
 
-    response = ws.statement_execution.execute_statement(
-        warehouse_id=warehouse_id,
-        statement=sql,
-        format=Format.JSON_ARRAY,
-        disposition=Disposition.INLINE,
-        wait_timeout="30s",
-    )
+    try:
+        response = ws.statement_execution.execute_statement(
+            warehouse_id=warehouse_id,
+            statement=sql,
+            parameters=parameters,
+            format=Format.JSON_ARRAY,
+            disposition=Disposition.INLINE,
+            wait_timeout="30s",
+        )
+    except Exception as e:
+        if "WAREHOUSE" in str(e).upper():
+            # The discovered warehouse may be gone or stopped; re-discover next time
+            invalidate_warehouse(ws)
+        raise
 
     if response.status.state == StatementState.FAILED:
         error_msg = response.status.error.message if response.status.error else "Unknown error"
@@ -71,66 +148,154 @@ def _execute_sql(ws, warehouse_id: str, sql: str) -> list[dict]:
 
     columns = [col.name for col in response.manifest.schema.columns] if response.manifest else []
 
-    results = []
-    for row in response.result.data_array:
-        row_dict = {}
-        for i, col_name in enumerate(columns):
-            row_dict[col_name] = row[i] if i < len(row) else None
-        results.append(row_dict)
+    return [dict(zip(columns, row)) for row in response.result.data_array]
 
-    return results
 
+def _list_clusters_limited(ws, limit: int = 100, states: tuple[State, ...] | None = None) -> list:
+    """List clusters with a limit to avoid timeout on large workspaces.
 
-def _get_warehouse_id(ws, config) -> str:
-    """Get SQL warehouse ID from config or find a suitable one."""
-    if config.sql_warehouse_id:
-        return config.sql_warehouse_id
+    Results are shared across endpoints for a short TTL so a dashboard
+    loading several recommendation panels pays for one listing. When
+    states are given, the clusters API filters by state server-side, so
+    the limit is spent on matching clusters only. Callers get a shallow copy,
+    so sorting or filtering the returned list never touches the cached one.
+    """
+    cache_key = (ws.config.host, limit, states)
+    clusters = _cluster_list_cache.get(cache_key)
+    if clusters is not None:
+        return list(clusters)
+
+    with _cluster_list_locks_guard:
+        key_lock = _cluster_list_locks[cache_key]
+
+    with key_lock:
+        # Another request may have populated the entry while we waited
+        clusters = _cluster_list_cache.get(cache_key)
+        if clusters is None:
+            clusters = _fetch_cluster_listing(ws, cache_key)
+    return list(clusters)
+
+
+def _fetch_cluster_listing(ws, cache_key: tuple) -> list:
+    """List clusters from the API and store them under cache_key."""
+    _, limit, states = cache_key
+    filter_by = ListClustersFilterBy(cluster_states=list(states)) if states else None
+    clusters = list(islice(ws.clusters.list(filter_by=filter_by, page_size=limit), limit))
+    if len(clusters) == limit:
+        logger.info(f"Reached cluster limit of {limit}")
+    _cluster_list_cache.set(cache_key, clusters)
+    return clusters
 
-    warehouses = list(ws.warehouses.list())
-    for wh in warehouses:
-        if wh.state and wh.state.value == "RUNNING":
-            logger.info(f"Using warehouse: {wh.name} ({wh.id})")
-            return wh.id
 
-    if warehouses:
-        logger.info(f"Using warehouse: {warehouses[0].name} ({warehouses[0].id})")
-        return warehouses[0].id
+def _effective_workers(cluster) -> int:
+    """Get the worker count, using the autoscale midpoint when autoscaling."""
+    if cluster.autoscale:
+        return (cluster.autoscale.min_workers + cluster.autoscale.max_workers) // 2
+    return cluster.num_workers or 0
 
-    raise HTTPException(
-        status_code=500,
-        detail="No SQL warehouse available. Configure CLUSTER_MANAGER_SQL_WAREHOUSE_ID"
-    )
 
+def invalidate_cluster_listings() -> None:
+    """Drop cached cluster listings after a cluster state change."""
+    _cluster_list_cache.clear()
 
-def _list_clusters_limited(ws, limit: int = 100) -> list:
-    """List clusters with a limit to avoid timeout on large workspaces."""
-    clusters = []
-    for i, cluster in enumerate(ws.clusters.list()):
-        clusters.append(cluster)
-        if i + 1 >= limit:
-            logger.info(f"Reached cluster limit of {limit}")
-            break
-    return clusters
+
+# Cluster sources that map to a dedicated cluster type; anything else is interactive
+_SOURCE_TO_CLUSTER_TYPE: dict[str, ClusterType] = {
+    "JOB": ClusterType.JOB,
+    "SQL": ClusterType.SQL,
+    "PIPELINE": ClusterType.PIPELINE,
+    "PIPELINE_MAINTENANCE": ClusterType.PIPELINE,
+    "MODELS": ClusterType.MODELS,
+}
+
+
+def _enum_str(value) -> str | None:
+    """Get the string value of an SDK enum or plain value (None if unset)."""
+    if value is None:
+        return None
+    return getattr(value, 'value', None) or str(value)
+
+
+def _source_value(cluster) -> str | None:
+    """Get the cluster source as a plain string (None if unset)."""
+    return _enum_str(cluster.cluster_source)
 
 
 def _classify_cluster(cluster) -> ClusterType:
     """Classify cluster type based on source."""
-    source = cluster.cluster_source
-    if source is None:
-        return ClusterType.INTERACTIVE
-
-    source_value = source.value if hasattr(source, 'value') else str(source)
-
-    if source_value == "JOB":
-        return ClusterType.JOB
-    elif source_value == "SQL":
-        return ClusterType.SQL
-    elif source_value in ["PIPELINE", "PIPELINE_MAINTENANCE"]:
-        return ClusterType.PIPELINE
-    elif source_value == "MODELS":
-        return ClusterType.MODELS
-    else:
-        return ClusterType.INTERACTIVE
+    return _SOURCE_TO_CLUSTER_TYPE.get(_source_value(cluster), ClusterType.INTERACTIVE)
+
+
+def _cluster_config_signature(cluster) -> tuple:
+    """Build a hashable signature of every cluster field the analyzers read."""
+    autoscale = cluster.autoscale
+    aws = cluster.aws_attributes
+    azure = cluster.azure_attributes
+    gcp = cluster.gcp_attributes
+    return (
+        cluster.cluster_id,
+        cluster.cluster_name,
+        cluster.cluster_source,
+        cluster.spark_version,
+        cluster.node_type_id,
+        cluster.driver_node_type_id,
+        cluster.num_workers,
+        (autoscale.min_workers, autoscale.max_workers) if autoscale else None,
+        cluster.autotermination_minutes,
+        frozenset((cluster.spark_conf or {}).items()),
+        (
+            aws.availability,
+            aws.first_on_demand,
+            aws.spot_bid_price_percent,
+            aws.zone_id,
+            aws.ebs_volume_type,
+        ) if aws else None,
+        (azure.availability, azure.first_on_demand) if azure else None,
+        gcp.use_preemptible_executors if gcp else None,
+    )
+
+
+def _analyze_clusters(clusters, analyzer, kind: str) -> list:
+    """Run a per-cluster analyzer over clusters, skipping any that fail to analyze.
+
+    Analyzers are pure CPU work on in-memory SDK objects, so a plain loop is
+    used; a thread pool would serialize on the GIL and only add overhead.
+    Results are cached by configuration signature, so unchanged clusters are
+    not re-analyzed on dashboard refreshes.
+    """
+    analyses = []
+    for cluster in clusters:
+        analysis = _run_analyzer(cluster, _cluster_config_signature(cluster), analyzer, kind)
+        if analysis is not None:
+            analyses.append(analysis)
+    return analyses
+
+
+def _run_analyzer(cluster, signature: tuple, analyzer, kind: str):
+    """Run one analyzer on a cluster through the analysis cache; None on failure."""
+    try:
+        cache_key = (analyzer.__name__, signature)
+        analysis = _analysis_cache.get(cache_key)
+        if analysis is None:
+            analysis = analyzer(cluster)
+            _analysis_cache.set(cache_key, analysis)
+        return analysis
+    except Exception as e:
+        logger.warning(f"Could not analyze cluster {cluster.cluster_id} for {kind}: {e}")
+        return None
+
+
+def _wants_ndjson(request: Request) -> bool:
+    """Check whether the client asked for newline-delimited JSON."""
+    return "application/x-ndjson" in request.headers.get("accept", "")
+
+
+def _ndjson_response(items) -> StreamingResponse:
+    """Stream models as newline-delimited JSON, serializing one item at a time."""
+    return StreamingResponse(
+        (item.model_dump_json() + "\n" for item in items),
+        media_type="application/x-ndjson",
+    )
 
 
 def _calculate_efficiency(actual_dbu: float, workers: int, uptime_hours: float) -> float:
@@ -143,6 +308,8 @@ def _calculate_efficiency(actual_dbu: float, workers: int, uptime_hours: float)
 
 @router.get("/summary", response_model=OptimizationSummary)
 def get_optimization_summary(
+    request: Request,
+    response: Response,
     ws: Dependency.Client,
     config: Dependency.Config,
 ) -> OptimizationSummary:
@@ -151,21 +318,46 @@ def get_optimization_summary(
 
     clusters = _list_clusters_limited(ws, limit=100)
 
+    # Fingerprint the fields the summary depends on; any cluster edit, start
+    # or stop changes it, so cached summaries never outlive the data they describe.
+    # Digested with sha256 rather than hash(), which is salted per process, so
+    # every worker and restart hands out the same ETag for the same clusters
+    fingerprint = hashlib.sha256(repr([
+        (
+            c.cluster_id,
+            c.state.value if c.state else None,
+            c.num_workers,
+            c.autoscale.min_workers if c.autoscale else None,
+            c.autoscale.max_workers if c.autoscale else None,
+            c.autotermination_minutes,
+        )
+        for c in clusters
+    ]).encode()).hexdigest()[:16]
+    etag = f'W/"{fingerprint}"'
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = f"private, max-age={_SUMMARY_TTL_SECONDS}"
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=dict(response.headers))
+
+    cache_key = (ws.config.host, fingerprint)
+    cached = _summary_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     oversized_count = 0
     underutilized_count = 0
     total_savings = 0.0
     recommendations_count = 0
 
     for cluster in clusters:
-        if cluster.state != State.RUNNING:
+        if cluster.state is not State.RUNNING:
             continue
 
-        workers = cluster.num_workers or 0
-        if cluster.autoscale:
-            workers = (cluster.autoscale.min_workers + cluster.autoscale.max_workers) // 2
+        workers = _effective_workers(cluster)
 
         # Check for missing auto-termination
-        auto_terminate = getattr(cluster, 'autotermination_minutes', None)
+        auto_terminate = cluster.autotermination_minutes
         if auto_terminate is None or auto_terminate == 0:
             recommendations_count += 1
             # Estimate 2 hours of idle time per day at $0.15/DBU
@@ -183,7 +375,7 @@ def get_optimization_summary(
         if workers >= 20:
             oversized_count += 1
 
-    return OptimizationSummary(
+    summary = OptimizationSummary(
         total_clusters_analyzed=len(clusters),
         oversized_clusters=oversized_count,
         underutilized_clusters=underutilized_count,
@@ -191,6 +383,8 @@ def get_optimization_summary(
         recommendations_count=recommendations_count,
         last_analysis_time=datetime.now(timezone.utc),
     )
+    _summary_cache.set(cache_key, summary)
+    return summary
 
 
 @router.get("/oversized-clusters", response_model=list[OversizedClusterAnalysis])
@@ -198,6 +392,7 @@ def get_oversized_clusters(
     ws: Dependency.Client,
     config: Dependency.Config,
     min_workers: Annotated[int, Query(ge=1)] = 10,
+    top_k: Annotated[int, Query(ge=1, le=500)] = 50,
 ) -> list[OversizedClusterAnalysis]:
     """Get clusters that are potentially oversized based on configuration.
 
@@ -209,9 +404,7 @@ def get_oversized_clusters(
     oversized = []
 
     for cluster in clusters:
-        workers = cluster.num_workers or 0
-        if cluster.autoscale:
-            workers = (cluster.autoscale.max_workers + cluster.autoscale.min_workers) // 2
+        workers = _effective_workers(cluster)
 
         if workers < min_workers:
             continue
@@ -242,11 +435,10 @@ def get_oversized_clusters(
             potential_cost_savings=round(monthly_cost_savings, 2),
         ))
 
-    # Sort by potential savings
-    oversized.sort(key=lambda x: x.potential_cost_savings, reverse=True)
-
     logger.info(f"Found {len(oversized)} potentially oversized clusters")
-    return oversized
+
+    # Keep only the top_k by potential savings
+    return heapq.nlargest(top_k, oversized, key=attrgetter("potential_cost_savings"))
 
 
 @router.get("/job-recommendations", response_model=list[JobClusterRecommendation])
@@ -267,38 +459,31 @@ def get_job_recommendations(
     recommendations = []
 
     # Group clusters by creator
-    clusters_by_user: dict[str, list] = {}
+    clusters_by_user: defaultdict[str, list] = defaultdict(list)
     large_interactive = []
     always_on_clusters = []
 
     for cluster in clusters:
-        creator = cluster.creator_user_name or "unknown"
-        if creator not in clusters_by_user:
-            clusters_by_user[creator] = []
-        clusters_by_user[creator].append(cluster)
-
-        workers = cluster.num_workers or 0
-        if cluster.autoscale:
-            workers = (cluster.autoscale.min_workers + cluster.autoscale.max_workers) // 2
+        clusters_by_user[cluster.creator_user_name or "unknown"].append(cluster)
 
-        cluster_type = _classify_cluster(cluster)
+        workers = _effective_workers(cluster)
 
-        # Track large interactive clusters
-        if cluster_type == ClusterType.INTERACTIVE and workers >= 4:
+        # Track large interactive clusters (classify only when size qualifies)
+        if workers >= 4 and _classify_cluster(cluster) is ClusterType.INTERACTIVE:
             large_interactive.append(cluster)
 
         # Track clusters without auto-termination (always-on risk)
-        auto_terminate = getattr(cluster, 'autotermination_minutes', None)
+        auto_terminate = cluster.autotermination_minutes
         if auto_terminate is None or auto_terminate == 0:
-            if cluster.state == State.RUNNING and workers >= 2:
+            if cluster.state is State.RUNNING and workers >= 2:
                 always_on_clusters.append(cluster)
 
     # Recommendation 1: Users with multiple clusters could consolidate
     for user, user_clusters in clusters_by_user.items():
         if len(user_clusters) >= 3:
             # User has 3+ clusters - recommend consolidation
-            running = [c for c in user_clusters if c.state == State.RUNNING]
-            terminated = [c for c in user_clusters if c.state == State.TERMINATED]
+            running = [c for c in user_clusters if c.state is State.RUNNING]
+            terminated = [c for c in user_clusters if c.state is State.TERMINATED]
 
             if len(running) >= 2:
                 # Multiple running clusters from same user
@@ -335,9 +520,7 @@ def get_job_recommendations(
         if len(recommendations) >= 8:
             break
 
-        workers = cluster.num_workers or 0
-        if cluster.autoscale:
-            workers = (cluster.autoscale.min_workers + cluster.autoscale.max_workers) // 2
+        workers = _effective_workers(cluster)
 
         # Estimate monthly cost for always-on
         monthly_dbu = (workers + 1) * 24 * 30  # DBUs per month
@@ -355,22 +538,26 @@ def get_job_recommendations(
 
     # Recommendation 3: Similar clusters that could be shared
     if len(recommendations) < 5 and len(large_interactive) >= 2:
-        # Find clusters with similar configurations
-        for i, c1 in enumerate(large_interactive[:5]):
+        # Bucket by configuration in one pass instead of comparing every pair
+        similar_groups: defaultdict[tuple, list] = defaultdict(list)
+        for cluster in large_interactive:
+            similar_groups[(cluster.node_type_id, cluster.spark_version)].append(cluster)
+
+        for group in similar_groups.values():
             if len(recommendations) >= 8:
                 break
-            for c2 in large_interactive[i + 1:6]:
-                if c1.node_type_id == c2.node_type_id and c1.spark_version == c2.spark_version:
-                    recommendations.append(JobClusterRecommendation(
-                        source_cluster_id=c1.cluster_id,
-                        source_cluster_name=c1.cluster_name or "Unnamed",
-                        target_cluster_id=c2.cluster_id,
-                        target_cluster_name=c2.cluster_name or "Unnamed",
-                        job_count=2,
-                        reason=f"Similar config (same node type & runtime). Consider sharing one cluster.",
-                        estimated_savings="$50-300/month by sharing resources",
-                    ))
-                    break
+            if len(group) < 2:
+                continue
+            c1, c2 = group[0], group[1]
+            recommendations.append(JobClusterRecommendation(
+                source_cluster_id=c1.cluster_id,
+                source_cluster_name=c1.cluster_name or "Unnamed",
+                target_cluster_id=c2.cluster_id,
+                target_cluster_name=c2.cluster_name or "Unnamed",
+                job_count=len(group),
+                reason=f"Similar config (same node type & runtime). Consider sharing one cluster.",
+                estimated_savings="$50-300/month by sharing resources",
+            ))
 
     logger.info(f"Generated {len(recommendations)} job recommendations")
     return recommendations
@@ -380,6 +567,7 @@ def get_job_recommendations(
 def get_schedule_recommendations(
     ws: Dependency.Client,
     config: Dependency.Config,
+    top_k: Annotated[int, Query(ge=1, le=500)] = 50,
 ) -> list[ScheduleOptimizationRecommendation]:
     """Get recommendations for optimizing cluster start/stop schedules.
 
@@ -391,15 +579,13 @@ def get_schedule_recommendations(
     recommendations = []
 
     for cluster in clusters:
-        auto_terminate = getattr(cluster, 'autotermination_minutes', None)
+        auto_terminate = cluster.autotermination_minutes
 
         # Only recommend for running or recently used clusters
-        if cluster.state not in [State.RUNNING, State.TERMINATED]:
+        if cluster.state not in (State.RUNNING, State.TERMINATED):
             continue
 
-        workers = cluster.num_workers or 0
-        if cluster.autoscale:
-            workers = (cluster.autoscale.min_workers + cluster.autoscale.max_workers) // 2
+        workers = _effective_workers(cluster)
 
         # Skip very small clusters
         if workers < 2:
@@ -413,7 +599,7 @@ def get_schedule_recommendations(
                 current_auto_terminate_minutes=auto_terminate,
                 recommended_auto_terminate_minutes=60,
                 avg_idle_time_per_day_minutes=120.0,  # Estimate
-                peak_usage_hours=[9, 10, 11, 14, 15, 16],  # Business hours
+                peak_usage_hours=_DEFAULT_PEAK_USAGE,
                 reason="No auto-termination configured. Recommended: 60 minutes to prevent idle costs.",
             ))
         elif auto_terminate > 120:
@@ -424,15 +610,16 @@ def get_schedule_recommendations(
                 current_auto_terminate_minutes=auto_terminate,
                 recommended_auto_terminate_minutes=60,
                 avg_idle_time_per_day_minutes=float(auto_terminate - 60),
-                peak_usage_hours=[9, 10, 11, 14, 15, 16],
+                peak_usage_hours=_DEFAULT_PEAK_USAGE,
                 reason=f"Auto-termination of {auto_terminate} minutes is long. Consider reducing to 60-90 minutes.",
             ))
 
-    # Sort by estimated idle time
-    recommendations.sort(key=lambda x: x.avg_idle_time_per_day_minutes, reverse=True)
-
     logger.info(f"Generated {len(recommendations)} schedule recommendations")
-    return recommendations
+
+    # Keep only the top_k by estimated idle time
+    return heapq.nlargest(
+        top_k, recommendations, key=attrgetter("avg_idle_time_per_day_minutes")
+    )
 
 
 @router.get("/cluster/{cluster_id}/history", response_model=list[ClusterUtilizationMetric])
@@ -449,39 +636,19 @@ def get_cluster_history(
     logger.info(f"Getting {days}-day history for cluster {cluster_id}")
 
     try:
-        warehouse_id = _get_warehouse_id(ws, config)
-
-        sql = f"""
-        SELECT *
-        FROM {config.metrics_catalog}.{config.metrics_schema}.cluster_utilization_metrics
-        WHERE cluster_id = '{cluster_id}'
-            AND metric_date >= CURRENT_DATE - INTERVAL {days} DAY
-        ORDER BY metric_date DESC
-        """
-
-        results = _execute_sql(ws, warehouse_id, sql)
-
-        metrics = []
-        for row in results:
-            metric_date = row.get('metric_date')
-            if isinstance(metric_date, str):
-                metric_date = datetime.fromisoformat(metric_date.replace('Z', '+00:00'))
-
-            metrics.append(ClusterUtilizationMetric(
-                cluster_id=row.get('cluster_id', cluster_id),
-                cluster_name=row.get('cluster_name', 'Unknown'),
-                metric_date=metric_date or datetime.now(timezone.utc),
-                cluster_type=ClusterType(row.get('cluster_type', 'INTERACTIVE')),
-                worker_count=int(row.get('worker_count') or 0),
-                potential_dbu_per_hour=float(row.get('potential_dbu_per_hour') or 0),
-                actual_dbu=float(row.get('actual_dbu') or 0),
-                uptime_hours=float(row.get('uptime_hours') or 0),
-                efficiency_score=float(row.get('efficiency_score') or 0),
-                job_run_count=int(row['job_run_count']) if row.get('job_run_count') else None,
-                unique_users=int(row['unique_users']) if row.get('unique_users') else None,
-                is_oversized=bool(row.get('is_oversized')),
-                is_underutilized=bool(row.get('is_underutilized')),
-            ))
+        warehouse_id = get_warehouse_id(ws, config)
+
+        # Bind values as parameters: the statement text stays constant across
+        # clusters and a cluster_id can never break out of the string literal
+        sql = _HISTORY_SQL.format(table=_metrics_table(config))
+        parameters = [
+            StatementParameterListItem(name="cluster_id", value=cluster_id, type="STRING"),
+            StatementParameterListItem(name="days", value=str(days), type="INT"),
+        ]
+
+        results = _execute_sql(ws, warehouse_id, sql, parameters)
+
+        metrics = [_row_to_utilization_metric(row, cluster_id) for row in results]
 
         logger.info(f"Found {len(metrics)} historical records for cluster {cluster_id}")
         return metrics
@@ -493,12 +660,86 @@ def get_cluster_history(
         return []
 
 
+@router.post("/cluster-histories", response_model=dict[str, list[ClusterUtilizationMetric]])
+def get_cluster_histories(
+    request: ClusterHistoriesRequest,
+    ws: Dependency.Client,
+    config: Dependency.Config,
+) -> dict[str, list[ClusterUtilizationMetric]]:
+    """Get utilization history for several clusters in a single SQL round trip.
+
+    Returns a mapping of cluster_id to its daily metrics (newest first).
+    """
+    cluster_ids = list(dict.fromkeys(request.cluster_ids))
+    logger.info(f"Getting {request.days}-day history for {len(cluster_ids)} clusters")
+
+    histories: dict[str, list[ClusterUtilizationMetric]] = {cid: [] for cid in cluster_ids}
+
+    try:
+        warehouse_id = get_warehouse_id(ws, config)
+
+        placeholders = ", ".join(f":c{i}" for i in range(len(cluster_ids)))
+        parameters = [
+            StatementParameterListItem(name=f"c{i}", value=cid, type="STRING")
+            for i, cid in enumerate(cluster_ids)
+        ]
+        parameters.append(
+            StatementParameterListItem(name="days", value=str(request.days), type="INT")
+        )
+
+        sql = _HISTORIES_SQL.format(table=_metrics_table(config), placeholders=placeholders)
+
+        results = _execute_sql(ws, warehouse_id, sql, parameters)
+
+        # Rows arrive ordered by cluster_id, so groupby partitions them in one pass
+        for cluster_id, rows in groupby(results, key=itemgetter('cluster_id')):
+            histories[cluster_id] = [_row_to_utilization_metric(row, cluster_id) for row in rows]
+
+        logger.info(f"Found {len(results)} historical records for {len(cluster_ids)} clusters")
+        return histories
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.warning(f"Could not fetch cluster histories: {e}")
+        return histories
+
+
+@lru_cache(maxsize=1024)
+def _parse_iso_datetime(value: str) -> datetime:
+    """Parse an ISO-8601 timestamp from SQL results (memoized; dates repeat across clusters)."""
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def _row_to_utilization_metric(row: dict, cluster_id: str) -> ClusterUtilizationMetric:
+    """Convert a cluster_utilization_metrics row into a ClusterUtilizationMetric."""
+    metric_date = row.get('metric_date')
+    if isinstance(metric_date, str):
+        metric_date = _parse_iso_datetime(metric_date)
+
+    return ClusterUtilizationMetric(
+        cluster_id=row.get('cluster_id', cluster_id),
+        cluster_name=row.get('cluster_name', 'Unknown'),
+        metric_date=metric_date or datetime.now(timezone.utc),
+        cluster_type=ClusterType(row.get('cluster_type', 'INTERACTIVE')),
+        worker_count=int(row.get('worker_count') or 0),
+        potential_dbu_per_hour=float(row.get('potential_dbu_per_hour') or 0),
+        actual_dbu=float(row.get('actual_dbu') or 0),
+        uptime_hours=float(row.get('uptime_hours') or 0),
+        efficiency_score=float(row.get('efficiency_score') or 0),
+        job_run_count=int(row['job_run_count']) if row.get('job_run_count') else None,
+        unique_users=int(row['unique_users']) if row.get('unique_users') else None,
+        is_oversized=bool(row.get('is_oversized')),
+        is_underutilized=bool(row.get('is_underutilized')),
+    )
+
+
+@lru_cache(maxsize=256)
 def _is_photon_runtime(spark_version: str | None) -> bool:
-    """Check if the Spark version indicates Photon is enabled."""
+    """Check if the Spark version indicates Photon is enabled (memoized per version string)."""
     if not spark_version:
         return False
-    version_lower = spark_version.lower()
-    return "photon" in version_lower or "-photon-" in version_lower
+    return "photon" in spark_version.lower()
 
 
 def _get_spark_conf_value(spark_conf: dict, key: str) -> str | None:
@@ -508,99 +749,159 @@ def _get_spark_conf_value(spark_conf: dict, key: str) -> str | None:
     return spark_conf.get(key)
 
 
+# Spark memory suffix -> GB multiplier (values without a suffix are bytes)
+_MEM_SUFFIX_GB = {"g": 1.0, "m": 1 / 1024, "k": 1 / (1024 * 1024)}
+
+
+@lru_cache(maxsize=256)
+def _parse_memory_gb(mem_str: str) -> float:
+    """Parse a Spark memory value (e.g., "4g", "8192m") into GB."""
+    mem_str = mem_str.lower().strip()
+    scale = _MEM_SUFFIX_GB.get(mem_str[-1:])
+    if scale is None:
+        return float(mem_str) / (1024 * 1024 * 1024)
+    return float(mem_str[:-1]) * scale
+
+
+@lru_cache(maxsize=256)
+def _parse_int(value: str) -> int | None:
+    """Parse an integer Spark setting, returning None if it is not numeric."""
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=256)
+def _is_driver_memory_undersized(driver_memory: str, executor_memory: str) -> bool:
+    """Check whether driver memory is below half of executor memory."""
+    try:
+        return _parse_memory_gb(driver_memory) < _parse_memory_gb(executor_memory) * 0.5
+    except ValueError:
+        return False
+
+
+# --- Spark Configuration Rules ---
+# Boolean settings whose recommended default is "true"; an explicit "false"
+# produces a recommendation. Each table is walked in declared order so the
+# output order never depends on how the cluster's spark_conf was written:
+# AQE checks come first, Delta and dynamic allocation after the memory checks.
+
+_AQE_DOC_LINK = "https://docs.databricks.com/en/optimizations/aqe.html"
+
+_SPARK_AQE_RULES: dict[str, dict] = {
+    "spark.sql.adaptive.enabled": {
+        "recommended_value": "true",
+        "impact": SparkConfigImpact.PERFORMANCE,
+        "severity": SparkConfigSeverity.HIGH,
+        "reason": "AQE (Adaptive Query Execution) is disabled. AQE automatically optimizes query plans at runtime, improving performance for joins, aggregations, and skewed data.",
+        "documentation_link": _AQE_DOC_LINK,
+    },
+    "spark.sql.adaptive.coalescePartitions.enabled": {
+        "recommended_value": "true",
+        "impact": SparkConfigImpact.PERFORMANCE,
+        "severity": SparkConfigSeverity.MEDIUM,
+        "reason": "AQE partition coalescing is disabled. This feature reduces the number of partitions after shuffles, improving performance for small datasets.",
+        "documentation_link": _AQE_DOC_LINK,
+    },
+    "spark.sql.adaptive.skewJoin.enabled": {
+        "recommended_value": "true",
+        "impact": SparkConfigImpact.PERFORMANCE,
+        "severity": SparkConfigSeverity.MEDIUM,
+        "reason": "AQE skew join handling is disabled. This feature automatically splits skewed partitions to prevent data skew from slowing down joins.",
+        "documentation_link": _AQE_DOC_LINK,
+    },
+}
+
+_SPARK_TRAILING_RULES: dict[str, dict] = {
+    "spark.databricks.delta.autoOptimize.enabled": {
+        "recommended_value": "true",
+        "impact": SparkConfigImpact.PERFORMANCE,
+        "severity": SparkConfigSeverity.LOW,
+        "reason": "Delta auto-optimize is disabled. Auto-optimize automatically compacts small files during writes, improving read performance for downstream queries.",
+        "documentation_link": "https://docs.databricks.com/en/delta/tune-file-size.html",
+    },
+    "spark.dynamicAllocation.enabled": {
+        "recommended_value": "true",
+        "impact": SparkConfigImpact.COST,
+        "severity": SparkConfigSeverity.LOW,
+        "reason": "Dynamic allocation is disabled on a fixed-size cluster. Consider enabling to allow Spark to adjust executors based on workload, or use cluster autoscaling.",
+        "documentation_link": "https://docs.databricks.com/en/compute/configure.html",
+    },
+}
+
+# Rules that only apply to fixed-size clusters (autoscaling already adjusts capacity)
+_FIXED_SIZE_ONLY_RULES = frozenset({"spark.dynamicAllocation.enabled"})
+
+
+def _spark_bool_recs(rules: dict[str, dict], spark_conf: dict, cluster_id: str,
+                     cluster_name: str, is_fixed_size: bool) -> Iterator[SparkConfigRecommendation]:
+    """Yield a recommendation for each rule whose setting is explicitly "false"."""
+    for key, rule in rules.items():
+        value = spark_conf.get(key)
+        if value is None or value.lower() != "false":
+            continue
+        if key in _FIXED_SIZE_ONLY_RULES and not is_fixed_size:
+            continue
+        yield SparkConfigRecommendation(
+            cluster_id=cluster_id,
+            cluster_name=cluster_name,
+            setting=key,
+            current_value="false",
+            **rule,
+        )
+
+
 def _analyze_cluster_spark_config(cluster) -> ClusterSparkConfigAnalysis:
     """Analyze Spark configuration for a single cluster and generate recommendations."""
     cluster_id = cluster.cluster_id
     cluster_name = cluster.cluster_name or "Unnamed Cluster"
     spark_version = cluster.spark_version
-    spark_conf = getattr(cluster, 'spark_conf', {}) or {}
+    spark_conf = cluster.spark_conf or {}
 
     is_photon = _is_photon_runtime(spark_version)
     recommendations = []
 
     # --- AQE (Adaptive Query Execution) Analysis ---
 
-    # Check if AQE is enabled (default is true in DBR 7.3+)
-    aqe_enabled_str = _get_spark_conf_value(spark_conf, "spark.sql.adaptive.enabled")
-    aqe_enabled = None
-    if aqe_enabled_str is not None:
-        aqe_enabled = aqe_enabled_str.lower() == "true"
+    # AQE is enabled by default in DBR 7.3+; only an explicit value overrides it
+    aqe_enabled_str = spark_conf.get("spark.sql.adaptive.enabled")
+    aqe_enabled = aqe_enabled_str.lower() == "true" if aqe_enabled_str is not None else None
+    is_fixed_size = cluster.autoscale is None
 
-    if aqe_enabled_str is not None and aqe_enabled_str.lower() == "false":
-        recommendations.append(SparkConfigRecommendation(
-            cluster_id=cluster_id,
-            cluster_name=cluster_name,
-            setting="spark.sql.adaptive.enabled",
-            current_value="false",
-            recommended_value="true",
-            impact=SparkConfigImpact.PERFORMANCE,
-            severity=SparkConfigSeverity.HIGH,
-            reason="AQE (Adaptive Query Execution) is disabled. AQE automatically optimizes query plans at runtime, improving performance for joins, aggregations, and skewed data.",
-            documentation_link="https://docs.databricks.com/en/optimizations/aqe.html",
-        ))
-
-    # Check AQE coalesce partitions
-    aqe_coalesce = _get_spark_conf_value(spark_conf, "spark.sql.adaptive.coalescePartitions.enabled")
-    if aqe_coalesce is not None and aqe_coalesce.lower() == "false":
-        recommendations.append(SparkConfigRecommendation(
-            cluster_id=cluster_id,
-            cluster_name=cluster_name,
-            setting="spark.sql.adaptive.coalescePartitions.enabled",
-            current_value="false",
-            recommended_value="true",
-            impact=SparkConfigImpact.PERFORMANCE,
-            severity=SparkConfigSeverity.MEDIUM,
-            reason="AQE partition coalescing is disabled. This feature reduces the number of partitions after shuffles, improving performance for small datasets.",
-            documentation_link="https://docs.databricks.com/en/optimizations/aqe.html",
-        ))
-
-    # Check AQE skew join optimization
-    aqe_skew = _get_spark_conf_value(spark_conf, "spark.sql.adaptive.skewJoin.enabled")
-    if aqe_skew is not None and aqe_skew.lower() == "false":
-        recommendations.append(SparkConfigRecommendation(
-            cluster_id=cluster_id,
-            cluster_name=cluster_name,
-            setting="spark.sql.adaptive.skewJoin.enabled",
-            current_value="false",
-            recommended_value="true",
-            impact=SparkConfigImpact.PERFORMANCE,
-            severity=SparkConfigSeverity.MEDIUM,
-            reason="AQE skew join handling is disabled. This feature automatically splits skewed partitions to prevent data skew from slowing down joins.",
-            documentation_link="https://docs.databricks.com/en/optimizations/aqe.html",
-        ))
+    recommendations.extend(_spark_bool_recs(
+        _SPARK_AQE_RULES, spark_conf, cluster_id, cluster_name, is_fixed_size
+    ))
 
     # --- Shuffle Partitions Analysis ---
 
     shuffle_partitions = _get_spark_conf_value(spark_conf, "spark.sql.shuffle.partitions")
-    if shuffle_partitions is not None:
-        try:
-            partitions_int = int(shuffle_partitions)
-            if partitions_int > 2000:
-                recommendations.append(SparkConfigRecommendation(
-                    cluster_id=cluster_id,
-                    cluster_name=cluster_name,
-                    setting="spark.sql.shuffle.partitions",
-                    current_value=shuffle_partitions,
-                    recommended_value="200 (default) or use AQE auto-coalesce",
-                    impact=SparkConfigImpact.PERFORMANCE,
-                    severity=SparkConfigSeverity.MEDIUM,
-                    reason=f"Shuffle partitions set to {partitions_int}, which is very high. This can cause excessive task overhead and slow down small-to-medium queries. Consider using AQE to auto-tune partitions.",
-                    documentation_link="https://docs.databricks.com/en/optimizations/aqe.html",
-                ))
-            elif partitions_int < 10 and partitions_int > 0:
-                recommendations.append(SparkConfigRecommendation(
-                    cluster_id=cluster_id,
-                    cluster_name=cluster_name,
-                    setting="spark.sql.shuffle.partitions",
-                    current_value=shuffle_partitions,
-                    recommended_value="200 (default) or use AQE auto-coalesce",
-                    impact=SparkConfigImpact.PERFORMANCE,
-                    severity=SparkConfigSeverity.LOW,
-                    reason=f"Shuffle partitions set to only {partitions_int}. This may limit parallelism for large datasets. Consider using AQE to auto-tune partitions based on data size.",
-                    documentation_link="https://docs.databricks.com/en/optimizations/aqe.html",
-                ))
-        except ValueError:
-            pass
+    partitions_int = _parse_int(shuffle_partitions) if shuffle_partitions is not None else None
+    if partitions_int is not None:
+        if partitions_int > 2000:
+            recommendations.append(SparkConfigRecommendation(
+                cluster_id=cluster_id,
+                cluster_name=cluster_name,
+                setting="spark.sql.shuffle.partitions",
+                current_value=shuffle_partitions,
+                recommended_value="200 (default) or use AQE auto-coalesce",
+                impact=SparkConfigImpact.PERFORMANCE,
+                severity=SparkConfigSeverity.MEDIUM,
+                reason=f"Shuffle partitions set to {partitions_int}, which is very high. This can cause excessive task overhead and slow down small-to-medium queries. Consider using AQE to auto-tune partitions.",
+                documentation_link="https://docs.databricks.com/en/optimizations/aqe.html",
+            ))
+        elif 0 < partitions_int < 10:
+            recommendations.append(SparkConfigRecommendation(
+                cluster_id=cluster_id,
+                cluster_name=cluster_name,
+                setting="spark.sql.shuffle.partitions",
+                current_value=shuffle_partitions,
+                recommended_value="200 (default) or use AQE auto-coalesce",
+                impact=SparkConfigImpact.PERFORMANCE,
+                severity=SparkConfigSeverity.LOW,
+                reason=f"Shuffle partitions set to only {partitions_int}. This may limit parallelism for large datasets. Consider using AQE to auto-tune partitions based on data size.",
+                documentation_link="https://docs.databricks.com/en/optimizations/aqe.html",
+            ))
 
     # --- Broadcast Join Analysis ---
 
@@ -622,10 +923,7 @@ def _analyze_cluster_spark_config(cluster) -> ClusterSparkConfigAnalysis:
     # --- Photon Analysis ---
 
     # Check if this is a SQL/analytics workload that could benefit from Photon
-    cluster_source = getattr(cluster, 'cluster_source', None)
-    source_value = cluster_source.value if hasattr(cluster_source, 'value') else str(cluster_source) if cluster_source else None
-
-    if not is_photon and source_value in ["SQL", "UI", "API"]:
+    if not is_photon and _source_value(cluster) in ["SQL", "UI", "API"]:
         # Potentially could benefit from Photon
         recommendations.append(SparkConfigRecommendation(
             cluster_id=cluster_id,
@@ -645,71 +943,24 @@ def _analyze_cluster_spark_config(cluster) -> ClusterSparkConfigAnalysis:
     driver_memory = _get_spark_conf_value(spark_conf, "spark.driver.memory")
     executor_memory = _get_spark_conf_value(spark_conf, "spark.executor.memory")
 
-    if driver_memory and executor_memory:
-        try:
-            # Parse memory values (e.g., "4g", "8192m")
-            def parse_memory_gb(mem_str: str) -> float:
-                mem_str = mem_str.lower().strip()
-                if mem_str.endswith("g"):
-                    return float(mem_str[:-1])
-                elif mem_str.endswith("m"):
-                    return float(mem_str[:-1]) / 1024
-                elif mem_str.endswith("k"):
-                    return float(mem_str[:-1]) / (1024 * 1024)
-                return float(mem_str) / (1024 * 1024 * 1024)
-
-            driver_gb = parse_memory_gb(driver_memory)
-            executor_gb = parse_memory_gb(executor_memory)
-
-            if driver_gb < executor_gb * 0.5:
-                recommendations.append(SparkConfigRecommendation(
-                    cluster_id=cluster_id,
-                    cluster_name=cluster_name,
-                    setting="spark.driver.memory",
-                    current_value=driver_memory,
-                    recommended_value=f"At least {executor_memory} (match executor memory)",
-                    impact=SparkConfigImpact.RELIABILITY,
-                    severity=SparkConfigSeverity.MEDIUM,
-                    reason=f"Driver memory ({driver_memory}) is significantly smaller than executor memory ({executor_memory}). This can cause OOM errors when collecting results or broadcasting data.",
-                    documentation_link="https://docs.databricks.com/en/compute/configure.html",
-                ))
-        except (ValueError, AttributeError):
-            pass
-
-    # --- Delta Lake Optimization ---
-
-    delta_auto_optimize = _get_spark_conf_value(spark_conf, "spark.databricks.delta.autoOptimize.enabled")
-    if delta_auto_optimize is not None and delta_auto_optimize.lower() == "false":
+    if driver_memory and executor_memory and _is_driver_memory_undersized(driver_memory, executor_memory):
         recommendations.append(SparkConfigRecommendation(
             cluster_id=cluster_id,
             cluster_name=cluster_name,
-            setting="spark.databricks.delta.autoOptimize.enabled",
-            current_value="false",
-            recommended_value="true",
-            impact=SparkConfigImpact.PERFORMANCE,
-            severity=SparkConfigSeverity.LOW,
-            reason="Delta auto-optimize is disabled. Auto-optimize automatically compacts small files during writes, improving read performance for downstream queries.",
-            documentation_link="https://docs.databricks.com/en/delta/tune-file-size.html",
+            setting="spark.driver.memory",
+            current_value=driver_memory,
+            recommended_value=f"At least {executor_memory} (match executor memory)",
+            impact=SparkConfigImpact.RELIABILITY,
+            severity=SparkConfigSeverity.MEDIUM,
+            reason=f"Driver memory ({driver_memory}) is significantly smaller than executor memory ({executor_memory}). This can cause OOM errors when collecting results or broadcasting data.",
+            documentation_link="https://docs.databricks.com/en/compute/configure.html",
         ))
 
-    # --- Dynamic Allocation ---
+    # --- Delta Lake Optimization and Dynamic Allocation ---
 
-    dynamic_allocation = _get_spark_conf_value(spark_conf, "spark.dynamicAllocation.enabled")
-    if dynamic_allocation is not None and dynamic_allocation.lower() == "false":
-        # Check if this is a cluster without autoscale
-        autoscale = getattr(cluster, 'autoscale', None)
-        if autoscale is None:
-            recommendations.append(SparkConfigRecommendation(
-                cluster_id=cluster_id,
-                cluster_name=cluster_name,
-                setting="spark.dynamicAllocation.enabled",
-                current_value="false",
-                recommended_value="true",
-                impact=SparkConfigImpact.COST,
-                severity=SparkConfigSeverity.LOW,
-                reason="Dynamic allocation is disabled on a fixed-size cluster. Consider enabling to allow Spark to adjust executors based on workload, or use cluster autoscaling.",
-                documentation_link="https://docs.databricks.com/en/compute/configure.html",
-            ))
+    recommendations.extend(_spark_bool_recs(
+        _SPARK_TRAILING_RULES, spark_conf, cluster_id, cluster_name, is_fixed_size
+    ))
 
     return ClusterSparkConfigAnalysis(
         cluster_id=cluster_id,
@@ -727,6 +978,8 @@ def get_spark_config_recommendations(
     ws: Dependency.Client,
     config: Dependency.Config,
     include_no_issues: Annotated[bool, Query()] = False,
+    top: Annotated[int | None, Query(ge=1)] = None,
+    include_terminated: Annotated[bool, Query()] = False,
 ) -> list[ClusterSparkConfigAnalysis]:
     """Analyze Spark configurations across all clusters and provide recommendations.
 
@@ -741,250 +994,234 @@ def get_spark_config_recommendations(
 
     Args:
         include_no_issues: If True, include clusters with no configuration issues.
+        top: If set, return only the top N clusters by number of issues.
+        include_terminated: If True, also analyze terminated/errored clusters.
     """
     logger.info("Analyzing Spark configurations for all clusters")
 
-    clusters = _list_clusters_limited(ws, limit=100)
-    analyses = []
-
-    for cluster in clusters:
-        try:
-            analysis = _analyze_cluster_spark_config(cluster)
-
-            # Only include if there are issues or user wants all clusters
-            if analysis.total_issues > 0 or include_no_issues:
-                analyses.append(analysis)
-
-        except Exception as e:
-            logger.warning(f"Could not analyze cluster {cluster.cluster_id}: {e}")
-            continue
+    clusters = _list_clusters_limited(
+        ws, limit=100, states=None if include_terminated else _ACTIVE_STATES
+    )
+    analyses = [
+        analysis
+        for analysis in _analyze_clusters(clusters, _analyze_cluster_spark_config, "spark config")
+        # Only include if there are issues or user wants all clusters
+        if analysis.total_issues > 0 or include_no_issues
+    ]
 
     # Sort by number of issues (most issues first)
-    analyses.sort(key=lambda x: x.total_issues, reverse=True)
+    if top:
+        analyses = heapq.nlargest(top, analyses, key=attrgetter("total_issues"))
+    else:
+        analyses.sort(key=attrgetter("total_issues"), reverse=True)
 
     logger.info(f"Analyzed {len(clusters)} clusters, {len(analyses)} have configuration recommendations")
     return analyses
 
 
-def _detect_cloud_provider(cluster) -> str:
-    """Detect cloud provider from cluster attributes."""
-    if getattr(cluster, 'aws_attributes', None):
-        return "aws"
-    elif getattr(cluster, 'azure_attributes', None):
-        return "azure"
-    elif getattr(cluster, 'gcp_attributes', None):
-        return "gcp"
-    return "unknown"
-
+def _get_cloud(cluster) -> tuple[str, Any]:
+    """Detect cloud provider and return it with its cloud-specific attributes."""
+    if cluster.aws_attributes:
+        return "aws", cluster.aws_attributes
+    if cluster.azure_attributes:
+        return "azure", cluster.azure_attributes
+    if cluster.gcp_attributes:
+        return "gcp", cluster.gcp_attributes
+    return "unknown", None
 
-def _analyze_cluster_cost(cluster) -> ClusterCostAnalysis:
-    """Analyze cost optimization opportunities for a cluster."""
-    cluster_id = cluster.cluster_id
-    cluster_name = cluster.cluster_name or "Unnamed Cluster"
-    cloud_provider = _detect_cloud_provider(cluster)
-
-    recommendations = []
-
-    # Get worker count
-    num_workers = cluster.num_workers or 0
-    if cluster.autoscale:
-        num_workers = (cluster.autoscale.min_workers + cluster.autoscale.max_workers) // 2
 
-    # Extract cloud-specific attributes
-    aws_attrs = getattr(cluster, 'aws_attributes', None)
-    azure_attrs = getattr(cluster, 'azure_attributes', None)
-    gcp_attrs = getattr(cluster, 'gcp_attributes', None)
+# Node type substrings that mark GPU or very large instances
+_GPU_RE = re.compile(r'p3|p4|g4|g5|gpu|a10|v100|a100|t4')
+_BIG_INSTANCE_RE = re.compile(r'(?:24|16|12)xlarge|metal')
 
-    uses_spot = False
-    spot_bid_price = None
-    first_on_demand = None
-    availability_zone = None
-    ebs_volume_type = None
 
-    # --- AWS-specific analysis ---
-    if aws_attrs:
-        availability = getattr(aws_attrs, 'availability', None)
-        if availability:
-            availability_str = availability.value if hasattr(availability, 'value') else str(availability)
-            uses_spot = availability_str in ["SPOT", "SPOT_WITH_FALLBACK"]
-
-        spot_bid_price = getattr(aws_attrs, 'spot_bid_price_percent', None)
-        first_on_demand = getattr(aws_attrs, 'first_on_demand', None)
-        availability_zone = getattr(aws_attrs, 'zone_id', None)
-        ebs_volume_type = getattr(aws_attrs, 'ebs_volume_type', None)
-        if ebs_volume_type and hasattr(ebs_volume_type, 'value'):
-            ebs_volume_type = ebs_volume_type.value
-
-        # Check if not using spot instances
-        if not uses_spot and num_workers >= 2:
-            cluster_type = _classify_cluster(cluster)
-            # Recommend spot for non-critical workloads
-            if cluster_type in [ClusterType.INTERACTIVE, ClusterType.JOB]:
-                recommendations.append(CostOptimizationRecommendation(
-                    cluster_id=cluster_id,
-                    cluster_name=cluster_name,
-                    category=CostOptimizationCategory.SPOT_INSTANCES,
-                    current_state="On-Demand instances only",
-                    recommendation="Use Spot instances with fallback to On-Demand",
-                    estimated_savings_percent=60.0,
-                    severity=CostRecommendationSeverity.HIGH,
-                    reason="Spot instances can reduce compute costs by up to 70% compared to On-Demand. For fault-tolerant workloads, use SPOT_WITH_FALLBACK to automatically switch to On-Demand if Spot capacity is unavailable.",
-                    implementation_steps=[
-                        "Edit cluster configuration",
-                        "Under Advanced Options > Instances, set Availability to 'Spot with fallback'",
-                        "Set first_on_demand to 1 (keeps driver on On-Demand for stability)",
-                        "Save and restart cluster"
-                    ],
-                ))
+# Static implementation steps shared by every cost recommendation of a kind
+_STEPS_SPOT_AWS = (
+    "Edit cluster configuration",
+    "Under Advanced Options > Instances, set Availability to 'Spot with fallback'",
+    "Set first_on_demand to 1 (keeps driver on On-Demand for stability)",
+    "Save and restart cluster",
+)
 
-        # Check first_on_demand ratio
-        if uses_spot and first_on_demand is not None and num_workers > 0:
-            on_demand_ratio = first_on_demand / (num_workers + 1)  # +1 for driver
-            if on_demand_ratio > 0.5:
-                recommendations.append(CostOptimizationRecommendation(
-                    cluster_id=cluster_id,
-                    cluster_name=cluster_name,
-                    category=CostOptimizationCategory.SPOT_INSTANCES,
-                    current_state=f"{first_on_demand} On-Demand nodes out of {num_workers + 1} total",
-                    recommendation="Reduce first_on_demand to 1 (driver only)",
-                    estimated_savings_percent=30.0,
-                    severity=CostRecommendationSeverity.MEDIUM,
-                    reason=f"Currently {int(on_demand_ratio * 100)}% of nodes are On-Demand. For most workloads, only the driver needs On-Demand for stability. Workers can safely use Spot instances.",
-                    implementation_steps=[
-                        "Edit cluster configuration",
-                        "Under Advanced Options > Instances, set first_on_demand to 1",
-                        "This keeps driver stable while workers use cost-effective Spot instances"
-                    ],
-                ))
+_STEPS_FIRST_ON_DEMAND_AWS = (
+    "Edit cluster configuration",
+    "Under Advanced Options > Instances, set first_on_demand to 1",
+    "This keeps driver stable while workers use cost-effective Spot instances",
+)
 
-        # Check EBS volume type
-        if ebs_volume_type and ebs_volume_type == "GENERAL_PURPOSE_SSD":
-            cluster_type = _classify_cluster(cluster)
-            if cluster_type == ClusterType.JOB:
-                recommendations.append(CostOptimizationRecommendation(
-                    cluster_id=cluster_id,
-                    cluster_name=cluster_name,
-                    category=CostOptimizationCategory.STORAGE,
-                    current_state=f"EBS Volume Type: {ebs_volume_type}",
-                    recommendation="Consider THROUGHPUT_OPTIMIZED_HDD for batch jobs",
-                    estimated_savings_percent=15.0,
-                    severity=CostRecommendationSeverity.LOW,
-                    reason="For batch/ETL jobs that don't require low-latency storage, Throughput Optimized HDD can reduce storage costs while maintaining good sequential read/write performance.",
-                    implementation_steps=[
-                        "Edit cluster configuration",
-                        "Under Advanced Options > Instances, change EBS Volume Type",
-                        "Select Throughput Optimized HDD for batch workloads"
-                    ],
-                ))
+_STEPS_EBS_HDD_AWS = (
+    "Edit cluster configuration",
+    "Under Advanced Options > Instances, change EBS Volume Type",
+    "Select Throughput Optimized HDD for batch workloads",
+)
 
-    # --- Azure-specific analysis ---
-    elif azure_attrs:
-        availability = getattr(azure_attrs, 'availability', None)
-        if availability:
-            availability_str = availability.value if hasattr(availability, 'value') else str(availability)
-            uses_spot = availability_str in ["SPOT_AZURE", "SPOT_WITH_FALLBACK_AZURE"]
+_STEPS_SPOT_AZURE = (
+    "Edit cluster configuration",
+    "Under Azure Options, set Availability to 'Spot with fallback'",
+    "Set first_on_demand to 1 for driver stability",
+)
 
-        first_on_demand = getattr(azure_attrs, 'first_on_demand', None)
+_STEPS_PREEMPTIBLE_GCP = (
+    "Edit cluster configuration",
+    "Under GCP Options, enable 'Use preemptible executors'",
+    "Keep driver as standard VM for stability",
+)
 
-        if not uses_spot and num_workers >= 2:
-            cluster_type = _classify_cluster(cluster)
-            if cluster_type in [ClusterType.INTERACTIVE, ClusterType.JOB]:
-                recommendations.append(CostOptimizationRecommendation(
-                    cluster_id=cluster_id,
-                    cluster_name=cluster_name,
-                    category=CostOptimizationCategory.SPOT_INSTANCES,
-                    current_state="On-Demand VMs only",
-                    recommendation="Use Azure Spot VMs with fallback",
-                    estimated_savings_percent=60.0,
-                    severity=CostRecommendationSeverity.HIGH,
-                    reason="Azure Spot VMs can reduce compute costs by up to 90% compared to On-Demand. For fault-tolerant workloads, use Spot with fallback to automatically switch to On-Demand if Spot capacity is unavailable.",
-                    implementation_steps=[
-                        "Edit cluster configuration",
-                        "Under Azure Options, set Availability to 'Spot with fallback'",
-                        "Set first_on_demand to 1 for driver stability"
-                    ],
-                ))
+_STEPS_NON_GPU = (
+    "Review if workload actually requires GPU",
+    "For SQL/ETL workloads, use r5/r6i (memory-optimized) or c5/c6i (compute-optimized)",
+    "Edit cluster and select appropriate instance type",
+)
 
-    # --- GCP-specific analysis ---
-    elif gcp_attrs:
-        use_preemptible = getattr(gcp_attrs, 'use_preemptible_executors', False)
-        uses_spot = use_preemptible
+_STEPS_SMALLER_INSTANCES = (
+    "Evaluate workload parallelism requirements",
+    "Consider using smaller instances (4xlarge/8xlarge) with more workers",
+    "This often provides better cost/performance ratio for distributed workloads",
+)
 
-        if not uses_spot and num_workers >= 2:
-            cluster_type = _classify_cluster(cluster)
-            if cluster_type in [ClusterType.INTERACTIVE, ClusterType.JOB]:
-                recommendations.append(CostOptimizationRecommendation(
-                    cluster_id=cluster_id,
-                    cluster_name=cluster_name,
-                    category=CostOptimizationCategory.SPOT_INSTANCES,
-                    current_state="Standard VMs only",
-                    recommendation="Use Preemptible VMs for workers",
-                    estimated_savings_percent=60.0,
-                    severity=CostRecommendationSeverity.HIGH,
-                    reason="GCP Preemptible VMs can reduce compute costs by up to 80%. For Spark workloads that can tolerate interruptions, preemptible workers provide significant cost savings.",
-                    implementation_steps=[
-                        "Edit cluster configuration",
-                        "Under GCP Options, enable 'Use preemptible executors'",
-                        "Keep driver as standard VM for stability"
-                    ],
-                ))
+_STEPS_REDUCE_MIN_WORKERS = (
+    "Analyze actual usage patterns",
+    "Reduce min_workers to 1-2 for interactive clusters",
+    "Keep max_workers for peak capacity",
+    "Use auto-termination to stop idle clusters",
+)
 
-    # --- Node Type Analysis (all clouds) ---
-    node_type = cluster.node_type_id
-    driver_node_type = cluster.driver_node_type_id or node_type
 
-    # Check for expensive GPU instances on non-ML workloads
-    if node_type:
-        node_type_lower = node_type.lower()
-        cluster_type = _classify_cluster(cluster)
+def _aws_cost_recs(cluster_id, cluster_name, cluster_type, num_workers, uses_spot,
+                   first_on_demand, ebs_volume_type) -> Iterator[CostOptimizationRecommendation]:
+    """Yield AWS spot and storage recommendations."""
+    # Check if not using spot instances
+    if not uses_spot and num_workers >= 2:
+        # Recommend spot for non-critical workloads
+        if cluster_type in [ClusterType.INTERACTIVE, ClusterType.JOB]:
+            yield CostOptimizationRecommendation(
+                cluster_id=cluster_id,
+                cluster_name=cluster_name,
+                category=CostOptimizationCategory.SPOT_INSTANCES,
+                current_state="On-Demand instances only",
+                recommendation="Use Spot instances with fallback to On-Demand",
+                estimated_savings_percent=60.0,
+                severity=CostRecommendationSeverity.HIGH,
+                reason="Spot instances can reduce compute costs by up to 70% compared to On-Demand. For fault-tolerant workloads, use SPOT_WITH_FALLBACK to automatically switch to On-Demand if Spot capacity is unavailable.",
+                implementation_steps=_STEPS_SPOT_AWS,
+            )
+
+    # Check first_on_demand ratio
+    if uses_spot and first_on_demand is not None and num_workers > 0:
+        on_demand_ratio = first_on_demand / (num_workers + 1)  # +1 for driver
+        if on_demand_ratio > 0.5:
+            yield CostOptimizationRecommendation(
+                cluster_id=cluster_id,
+                cluster_name=cluster_name,
+                category=CostOptimizationCategory.SPOT_INSTANCES,
+                current_state=f"{first_on_demand} On-Demand nodes out of {num_workers + 1} total",
+                recommendation="Reduce first_on_demand to 1 (driver only)",
+                estimated_savings_percent=30.0,
+                severity=CostRecommendationSeverity.MEDIUM,
+                reason=f"Currently {int(on_demand_ratio * 100)}% of nodes are On-Demand. For most workloads, only the driver needs On-Demand for stability. Workers can safely use Spot instances.",
+                implementation_steps=_STEPS_FIRST_ON_DEMAND_AWS,
+            )
+
+    # Check EBS volume type
+    if ebs_volume_type and ebs_volume_type == "GENERAL_PURPOSE_SSD":
+        if cluster_type == ClusterType.JOB:
+            yield CostOptimizationRecommendation(
+                cluster_id=cluster_id,
+                cluster_name=cluster_name,
+                category=CostOptimizationCategory.STORAGE,
+                current_state=f"EBS Volume Type: {ebs_volume_type}",
+                recommendation="Consider THROUGHPUT_OPTIMIZED_HDD for batch jobs",
+                estimated_savings_percent=15.0,
+                severity=CostRecommendationSeverity.LOW,
+                reason="For batch/ETL jobs that don't require low-latency storage, Throughput Optimized HDD can reduce storage costs while maintaining good sequential read/write performance.",
+                implementation_steps=_STEPS_EBS_HDD_AWS,
+            )
+
+
+def _azure_cost_recs(cluster_id, cluster_name, cluster_type, num_workers,
+                     uses_spot) -> Iterator[CostOptimizationRecommendation]:
+    """Yield Azure spot recommendations."""
+    if not uses_spot and num_workers >= 2:
+        if cluster_type in [ClusterType.INTERACTIVE, ClusterType.JOB]:
+            yield CostOptimizationRecommendation(
+                cluster_id=cluster_id,
+                cluster_name=cluster_name,
+                category=CostOptimizationCategory.SPOT_INSTANCES,
+                current_state="On-Demand VMs only",
+                recommendation="Use Azure Spot VMs with fallback",
+                estimated_savings_percent=60.0,
+                severity=CostRecommendationSeverity.HIGH,
+                reason="Azure Spot VMs can reduce compute costs by up to 90% compared to On-Demand. For fault-tolerant workloads, use Spot with fallback to automatically switch to On-Demand if Spot capacity is unavailable.",
+                implementation_steps=_STEPS_SPOT_AZURE,
+            )
+
+
+def _gcp_cost_recs(cluster_id, cluster_name, cluster_type, num_workers,
+                   uses_spot) -> Iterator[CostOptimizationRecommendation]:
+    """Yield GCP preemptible VM recommendations."""
+    if not uses_spot and num_workers >= 2:
+        if cluster_type in [ClusterType.INTERACTIVE, ClusterType.JOB]:
+            yield CostOptimizationRecommendation(
+                cluster_id=cluster_id,
+                cluster_name=cluster_name,
+                category=CostOptimizationCategory.SPOT_INSTANCES,
+                current_state="Standard VMs only",
+                recommendation="Use Preemptible VMs for workers",
+                estimated_savings_percent=60.0,
+                severity=CostRecommendationSeverity.HIGH,
+                reason="GCP Preemptible VMs can reduce compute costs by up to 80%. For Spark workloads that can tolerate interruptions, preemptible workers provide significant cost savings.",
+                implementation_steps=_STEPS_PREEMPTIBLE_GCP,
+            )
+
+
+def _node_type_cost_recs(cluster_id, cluster_name, node_type, cluster_type,
+                         num_workers) -> Iterator[CostOptimizationRecommendation]:
+    """Yield GPU and very-large-instance recommendations (all clouds)."""
+    if not node_type:
+        return
+    node_type_lower = node_type.lower()
 
-        # Check if using GPU for non-ML workload
-        if any(gpu in node_type_lower for gpu in ['p3', 'p4', 'g4', 'g5', 'gpu', 'a10', 'v100', 'a100', 't4']):
-            if cluster_type not in [ClusterType.MODELS]:
-                recommendations.append(CostOptimizationRecommendation(
-                    cluster_id=cluster_id,
-                    cluster_name=cluster_name,
-                    category=CostOptimizationCategory.NODE_TYPE,
-                    current_state=f"Node type: {node_type} (GPU instance)",
-                    recommendation="Use non-GPU instances for non-ML workloads",
-                    estimated_savings_percent=70.0,
-                    severity=CostRecommendationSeverity.HIGH,
-                    reason="This cluster uses GPU instances but doesn't appear to be an ML workload. GPU instances are 3-10x more expensive than comparable CPU instances. Consider switching to memory or compute-optimized instances.",
-                    implementation_steps=[
-                        "Review if workload actually requires GPU",
-                        "For SQL/ETL workloads, use r5/r6i (memory-optimized) or c5/c6i (compute-optimized)",
-                        "Edit cluster and select appropriate instance type"
-                    ],
-                ))
+    # Check if using GPU for non-ML workload
+    if _GPU_RE.search(node_type_lower):
+        if cluster_type is not ClusterType.MODELS:
+            yield CostOptimizationRecommendation(
+                cluster_id=cluster_id,
+                cluster_name=cluster_name,
+                category=CostOptimizationCategory.NODE_TYPE,
+                current_state=f"Node type: {node_type} (GPU instance)",
+                recommendation="Use non-GPU instances for non-ML workloads",
+                estimated_savings_percent=70.0,
+                severity=CostRecommendationSeverity.HIGH,
+                reason="This cluster uses GPU instances but doesn't appear to be an ML workload. GPU instances are 3-10x more expensive than comparable CPU instances. Consider switching to memory or compute-optimized instances.",
+                implementation_steps=_STEPS_NON_GPU,
+            )
+
+    # Check for very large instances that might be oversized
+    if _BIG_INSTANCE_RE.search(node_type_lower):
+        if num_workers <= 2:
+            yield CostOptimizationRecommendation(
+                cluster_id=cluster_id,
+                cluster_name=cluster_name,
+                category=CostOptimizationCategory.NODE_TYPE,
+                current_state=f"Node type: {node_type} (very large instance)",
+                recommendation="Consider smaller instances with more workers",
+                estimated_savings_percent=20.0,
+                severity=CostRecommendationSeverity.MEDIUM,
+                reason="Using very large instances with few workers can be less cost-effective and provide less parallelism than smaller instances with more workers. Consider scaling out instead of scaling up.",
+                implementation_steps=_STEPS_SMALLER_INSTANCES,
+            )
 
-        # Check for very large instances that might be oversized
-        if any(size in node_type_lower for size in ['24xlarge', '16xlarge', '12xlarge', 'metal']):
-            if num_workers <= 2:
-                recommendations.append(CostOptimizationRecommendation(
-                    cluster_id=cluster_id,
-                    cluster_name=cluster_name,
-                    category=CostOptimizationCategory.NODE_TYPE,
-                    current_state=f"Node type: {node_type} (very large instance)",
-                    recommendation="Consider smaller instances with more workers",
-                    estimated_savings_percent=20.0,
-                    severity=CostRecommendationSeverity.MEDIUM,
-                    reason="Using very large instances with few workers can be less cost-effective and provide less parallelism than smaller instances with more workers. Consider scaling out instead of scaling up.",
-                    implementation_steps=[
-                        "Evaluate workload parallelism requirements",
-                        "Consider using smaller instances (4xlarge/8xlarge) with more workers",
-                        "This often provides better cost/performance ratio for distributed workloads"
-                    ],
-                ))
 
-    # --- Autoscaling Analysis ---
-    autoscale = cluster.autoscale
+def _autoscale_cost_recs(cluster_id, cluster_name, autoscale,
+                         num_workers) -> Iterator[CostOptimizationRecommendation]:
+    """Yield autoscaling cost recommendations."""
     if autoscale:
         min_workers = autoscale.min_workers
         max_workers = autoscale.max_workers
 
         # Check for wide autoscale range that might not be efficient
         if max_workers - min_workers > 20 and min_workers > 5:
-            recommendations.append(CostOptimizationRecommendation(
+            yield CostOptimizationRecommendation(
                 cluster_id=cluster_id,
                 cluster_name=cluster_name,
                 category=CostOptimizationCategory.AUTOSCALING,
@@ -993,16 +1230,11 @@ def _analyze_cluster_cost(cluster) -> ClusterCostAnalysis:
                 estimated_savings_percent=25.0,
                 severity=CostRecommendationSeverity.MEDIUM,
                 reason=f"High minimum workers ({min_workers}) means paying for capacity even during low-usage periods. Consider reducing min_workers to 1-2 and letting autoscaling add capacity as needed.",
-                implementation_steps=[
-                    "Analyze actual usage patterns",
-                    "Reduce min_workers to 1-2 for interactive clusters",
-                    "Keep max_workers for peak capacity",
-                    "Use auto-termination to stop idle clusters"
-                ],
-            ))
+                implementation_steps=_STEPS_REDUCE_MIN_WORKERS,
+            )
     elif num_workers >= 4:
         # Fixed-size cluster that could benefit from autoscaling
-        recommendations.append(CostOptimizationRecommendation(
+        yield CostOptimizationRecommendation(
             cluster_id=cluster_id,
             cluster_name=cluster_name,
             category=CostOptimizationCategory.AUTOSCALING,
@@ -1011,16 +1243,70 @@ def _analyze_cluster_cost(cluster) -> ClusterCostAnalysis:
             estimated_savings_percent=30.0,
             severity=CostRecommendationSeverity.MEDIUM,
             reason="Fixed-size clusters pay for full capacity even during low-usage periods. Autoscaling can reduce costs by scaling down when not needed and scaling up for peak demand.",
-            implementation_steps=[
+            implementation_steps=(
                 "Edit cluster configuration",
                 "Enable autoscaling with min_workers=1",
                 f"Set max_workers={num_workers} to maintain current peak capacity",
-                "This reduces idle costs while preserving performance"
-            ],
-        ))
+                "This reduces idle costs while preserving performance",
+            ),
+        )
+
+
+def _analyze_cluster_cost(cluster) -> ClusterCostAnalysis:
+    """Analyze cost optimization opportunities for a cluster."""
+    cluster_id = cluster.cluster_id
+    cluster_name = cluster.cluster_name or "Unnamed Cluster"
+    cloud_provider, cloud_attrs = _get_cloud(cluster)
+    cluster_type = _classify_cluster(cluster)
+
+    # Get worker count
+    num_workers = _effective_workers(cluster)
+
+    uses_spot = False
+    spot_bid_price = None
+    first_on_demand = None
+    availability_zone = None
+    ebs_volume_type = None
+
+    match cloud_provider:
+        case "aws":
+            uses_spot = _enum_str(cloud_attrs.availability) in ("SPOT", "SPOT_WITH_FALLBACK")
+            spot_bid_price = cloud_attrs.spot_bid_price_percent
+            first_on_demand = cloud_attrs.first_on_demand
+            availability_zone = cloud_attrs.zone_id
+            ebs_volume_type = _enum_str(cloud_attrs.ebs_volume_type)
+
+            cloud_recs = _aws_cost_recs(
+                cluster_id, cluster_name, cluster_type, num_workers, uses_spot,
+                first_on_demand, ebs_volume_type,
+            )
+        case "azure":
+            uses_spot = _enum_str(cloud_attrs.availability) in ("SPOT_AZURE", "SPOT_WITH_FALLBACK_AZURE")
+            first_on_demand = cloud_attrs.first_on_demand
+
+            cloud_recs = _azure_cost_recs(cluster_id, cluster_name, cluster_type, num_workers, uses_spot)
+        case "gcp":
+            uses_spot = bool(cloud_attrs.use_preemptible_executors)
+
+            cloud_recs = _gcp_cost_recs(cluster_id, cluster_name, cluster_type, num_workers, uses_spot)
+        case _:
+            cloud_recs = ()
+
+    node_type = cluster.node_type_id
+    driver_node_type = cluster.driver_node_type_id or node_type
+    autoscale = cluster.autoscale
+
+    # Collect recommendations and total their savings in a single pass
+    recommendations = []
+    total_savings = 0.0
+    for rec in chain(
+        cloud_recs,
+        _node_type_cost_recs(cluster_id, cluster_name, node_type, cluster_type, num_workers),
+        _autoscale_cost_recs(cluster_id, cluster_name, autoscale, num_workers),
+    ):
+        recommendations.append(rec)
+        total_savings += rec.estimated_savings_percent
 
-    # Calculate total potential savings
-    total_savings = sum(r.estimated_savings_percent for r in recommendations)
     # Cap at 90% (can't save more than that)
     total_savings = min(90.0, total_savings)
 
@@ -1047,6 +1333,8 @@ def get_cost_recommendations(
     ws: Dependency.Client,
     config: Dependency.Config,
     include_no_issues: Annotated[bool, Query()] = False,
+    top: Annotated[int | None, Query(ge=1)] = None,
+    include_terminated: Annotated[bool, Query()] = False,
 ) -> list[ClusterCostAnalysis]:
     """Analyze cost optimization opportunities across all clusters.
 
@@ -1059,31 +1347,53 @@ def get_cost_recommendations(
 
     Args:
         include_no_issues: If True, include clusters with no cost recommendations.
+        top: If set, return only the top N clusters by potential savings.
+        include_terminated: If True, also analyze terminated/errored clusters.
     """
     logger.info("Analyzing cost optimization for all clusters")
 
-    clusters = _list_clusters_limited(ws, limit=100)
-    analyses = []
-
-    for cluster in clusters:
-        try:
-            analysis = _analyze_cluster_cost(cluster)
-
-            # Only include if there are recommendations or user wants all clusters
-            if analysis.total_recommendations > 0 or include_no_issues:
-                analyses.append(analysis)
-
-        except Exception as e:
-            logger.warning(f"Could not analyze cluster {cluster.cluster_id} for cost: {e}")
-            continue
+    clusters = _list_clusters_limited(
+        ws, limit=100, states=None if include_terminated else _ACTIVE_STATES
+    )
+    analyses = [
+        analysis
+        for analysis in _analyze_clusters(clusters, _analyze_cluster_cost, "cost")
+        # Only include if there are recommendations or user wants all clusters
+        if analysis.total_recommendations > 0 or include_no_issues
+    ]
 
     # Sort by potential savings (highest first)
-    analyses.sort(key=lambda x: x.total_potential_savings_percent, reverse=True)
+    if top:
+        analyses = heapq.nlargest(top, analyses, key=attrgetter("total_potential_savings_percent"))
+    else:
+        analyses.sort(key=attrgetter("total_potential_savings_percent"), reverse=True)
 
     logger.info(f"Analyzed {len(clusters)} clusters, {len(analyses)} have cost recommendations")
     return analyses
 
 
+# Static implementation steps shared by every autoscaling recommendation of a kind
+_STEPS_SCALE_FROM_ZERO = (
+    "Edit autoscale configuration",
+    "Set min_workers=0 to enable scale-to-zero",
+    "Jobs will automatically scale up workers as needed",
+    "Consider job clusters for sporadic workloads",
+)
+
+_STEPS_ENABLE_AUTOTERMINATION = (
+    "Edit cluster configuration",
+    "Set autotermination_minutes to 60-120",
+    "Cluster will automatically stop after idle period",
+    "Start-up time is typically 2-5 minutes when needed",
+)
+
+_STEPS_AUTOSCALED_AUTOTERMINATION = (
+    "Set autotermination_minutes to 60-120",
+    "Cluster will terminate after inactivity",
+    "Combined with autoscaling: scales down first, then terminates if fully idle",
+)
+
+
 def _analyze_cluster_autoscaling(cluster) -> ClusterAutoscalingAnalysis:
     """Analyze autoscaling configuration for a cluster and generate recommendations."""
     cluster_id = cluster.cluster_id
@@ -1091,11 +1401,12 @@ def _analyze_cluster_autoscaling(cluster) -> ClusterAutoscalingAnalysis:
     cluster_type = _classify_cluster(cluster)
 
     recommendations = []
+    total_savings = 0.0
     autoscale = cluster.autoscale
-    auto_terminate = getattr(cluster, 'autotermination_minutes', None)
+    auto_terminate = cluster.autotermination_minutes
 
-    # Get current workers
-    current_workers = cluster.num_workers or 0
+    # Get current workers (autoscale midpoint when autoscaling)
+    current_workers = _effective_workers(cluster)
 
     has_autoscaling = autoscale is not None
     min_workers = None
@@ -1108,7 +1419,6 @@ def _analyze_cluster_autoscaling(cluster) -> ClusterAutoscalingAnalysis:
         max_workers = autoscale.max_workers
         autoscale_range = max_workers - min_workers
         range_ratio = max_workers / min_workers if min_workers > 0 else None
-        current_workers = (min_workers + max_workers) // 2
 
         # --- Issue 1: Wide Range Detection ---
         # If max >> min (ratio > 5x), it suggests uncertainty about actual needs
@@ -1122,13 +1432,14 @@ def _analyze_cluster_autoscaling(cluster) -> ClusterAutoscalingAnalysis:
                 estimated_savings_percent=20.0,
                 severity=AutoscalingSeverity.MEDIUM,
                 reason=f"Autoscale range is very wide ({range_ratio:.1f}x ratio). This suggests uncertainty about workload requirements. A very wide range can lead to slow scale-up times and unpredictable costs. Consider analyzing actual usage to set tighter bounds.",
-                implementation_steps=[
+                implementation_steps=(
                     "Review cluster metrics to understand actual peak usage",
                     f"If typical usage is {min_workers + autoscale_range // 4}-{min_workers + autoscale_range // 2} workers, adjust max accordingly",
                     "Consider setting max_workers to 2-3x typical usage for burst capacity",
-                    "Monitor for throttling after adjustment"
-                ],
+                    "Monitor for throttling after adjustment",
+                ),
             ))
+            total_savings += 20.0
 
         # --- Issue 2: Narrow Range Detection ---
         # If max ≈ min (range <= 2 and both >= 4), might as well use fixed size
@@ -1142,19 +1453,20 @@ def _analyze_cluster_autoscaling(cluster) -> ClusterAutoscalingAnalysis:
                 estimated_savings_percent=5.0,
                 severity=AutoscalingSeverity.LOW,
                 reason=f"Autoscale range is very narrow ({autoscale_range} workers). The overhead of autoscaling may not be worth it for such a small range. Consider either a fixed-size cluster (simpler, more predictable) or widening the range to get real benefit from autoscaling.",
-                implementation_steps=[
+                implementation_steps=(
                     "Evaluate if workload actually varies",
                     f"For stable workloads: use fixed {max_workers} workers",
                     f"For variable workloads: consider expanding range (e.g., {min_workers // 2} to {max_workers * 2})",
-                    "Fixed-size clusters have faster startup (no scaling delay)"
-                ],
+                    "Fixed-size clusters have faster startup (no scaling delay)",
+                ),
             ))
+            total_savings += 5.0
 
         # --- Issue 3: High Minimum Workers ---
         # High min_workers means paying for capacity even during idle periods
         if min_workers >= 8:
             # Estimate savings: assume 50% of time the cluster is at minimum
-            idle_savings = (min_workers - 2) / min_workers * 50  # % time at min × potential reduction
+            idle_savings = round((min_workers - 2) / min_workers * 50, 1)  # % time at min × potential reduction
             severity = AutoscalingSeverity.HIGH if min_workers >= 16 else AutoscalingSeverity.MEDIUM
 
             recommendations.append(AutoscalingRecommendation(
@@ -1163,17 +1475,18 @@ def _analyze_cluster_autoscaling(cluster) -> ClusterAutoscalingAnalysis:
                 issue_type=AutoscalingIssueType.HIGH_MINIMUM,
                 current_config=f"min_workers: {min_workers}",
                 recommendation=f"Reduce min_workers to 1-2 and rely on autoscaling",
-                estimated_savings_percent=round(idle_savings, 1),
+                estimated_savings_percent=idle_savings,
                 severity=severity,
                 reason=f"High minimum workers ({min_workers}) means paying for significant capacity even during low-usage periods. Unless your workload requires constant high capacity, reducing min_workers can significantly reduce idle costs while autoscaling handles peak demand.",
-                implementation_steps=[
+                implementation_steps=(
                     "Analyze when peak usage actually occurs",
                     "For interactive clusters: set min_workers=1 or 2",
                     "For job clusters: consider min_workers=0 (scale from zero)",
                     f"Keep max_workers={max_workers} for peak capacity",
-                    "Combine with auto-termination for further savings"
-                ],
+                    "Combine with auto-termination for further savings",
+                ),
             ))
+            total_savings += idle_savings
         elif min_workers >= 4 and cluster_type == ClusterType.INTERACTIVE:
             # Even 4+ min workers can be wasteful for interactive clusters
             recommendations.append(AutoscalingRecommendation(
@@ -1185,12 +1498,13 @@ def _analyze_cluster_autoscaling(cluster) -> ClusterAutoscalingAnalysis:
                 estimated_savings_percent=15.0,
                 severity=AutoscalingSeverity.LOW,
                 reason=f"Interactive clusters often have variable usage patterns. With min_workers={min_workers}, you pay for this capacity even when users aren't active. Reducing to 1-2 workers lets autoscaling handle demand while reducing idle costs.",
-                implementation_steps=[
+                implementation_steps=(
                     "Set min_workers=1 for interactive clusters",
                     "Enable auto-termination (60-120 min) for fully idle periods",
-                    f"max_workers={max_workers} ensures capacity for peak times"
-                ],
+                    f"max_workers={max_workers} ensures capacity for peak times",
+                ),
             ))
+            total_savings += 15.0
 
         # --- Issue 4: Inefficient Range for Cluster Type ---
         # Job clusters should consider scale-from-zero
@@ -1204,13 +1518,9 @@ def _analyze_cluster_autoscaling(cluster) -> ClusterAutoscalingAnalysis:
                 estimated_savings_percent=25.0,
                 severity=AutoscalingSeverity.MEDIUM,
                 reason="Job clusters typically run on-demand workloads. Setting min_workers=0 allows the cluster to scale to zero when not running jobs, eliminating idle costs completely. Jobs will trigger scale-up automatically.",
-                implementation_steps=[
-                    "Edit autoscale configuration",
-                    "Set min_workers=0 to enable scale-to-zero",
-                    "Jobs will automatically scale up workers as needed",
-                    "Consider job clusters for sporadic workloads"
-                ],
+                implementation_steps=_STEPS_SCALE_FROM_ZERO,
             ))
+            total_savings += 25.0
 
     else:
         # No autoscaling - fixed size cluster
@@ -1224,13 +1534,14 @@ def _analyze_cluster_autoscaling(cluster) -> ClusterAutoscalingAnalysis:
                 estimated_savings_percent=35.0,
                 severity=AutoscalingSeverity.HIGH,
                 reason=f"Fixed-size clusters with {current_workers} workers pay for full capacity continuously. Autoscaling can significantly reduce costs by scaling down during low-usage periods while maintaining capacity for peak demand.",
-                implementation_steps=[
+                implementation_steps=(
                     "Edit cluster configuration",
                     "Enable autoscaling with min_workers=1",
                     f"Set max_workers={current_workers} to maintain peak capacity",
-                    "Also enable auto-termination (60-120 min) for full idle periods"
-                ],
+                    "Also enable auto-termination (60-120 min) for full idle periods",
+                ),
             ))
+            total_savings += 35.0
 
         # Check for missing auto-termination (significant for any cluster)
         if auto_terminate is None or auto_terminate == 0:
@@ -1244,13 +1555,9 @@ def _analyze_cluster_autoscaling(cluster) -> ClusterAutoscalingAnalysis:
                     estimated_savings_percent=40.0,
                     severity=AutoscalingSeverity.HIGH,
                     reason="Without auto-termination, clusters run 24/7 even when completely idle. Enabling auto-termination (e.g., 60-120 minutes) automatically stops clusters after periods of inactivity, eliminating idle costs.",
-                    implementation_steps=[
-                        "Edit cluster configuration",
-                        "Set autotermination_minutes to 60-120",
-                        "Cluster will automatically stop after idle period",
-                        "Start-up time is typically 2-5 minutes when needed"
-                    ],
+                    implementation_steps=_STEPS_ENABLE_AUTOTERMINATION,
                 ))
+                total_savings += 40.0
 
     # Handle auto-termination for autoscaled clusters too
     if has_autoscaling and (auto_terminate is None or auto_terminate == 0):
@@ -1263,15 +1570,11 @@ def _analyze_cluster_autoscaling(cluster) -> ClusterAutoscalingAnalysis:
             estimated_savings_percent=20.0,
             severity=AutoscalingSeverity.MEDIUM,
             reason="While autoscaling reduces costs during low-usage, without auto-termination the cluster still runs at min_workers when completely idle. Enable auto-termination to stop the cluster entirely during extended idle periods.",
-            implementation_steps=[
-                "Set autotermination_minutes to 60-120",
-                "Cluster will terminate after inactivity",
-                "Combined with autoscaling: scales down first, then terminates if fully idle"
-            ],
+            implementation_steps=_STEPS_AUTOSCALED_AUTOTERMINATION,
         ))
+        total_savings += 20.0
 
     # Calculate total potential savings (cap at 80%)
-    total_savings = sum(r.estimated_savings_percent for r in recommendations)
     total_savings = min(80.0, total_savings)
 
     return ClusterAutoscalingAnalysis(
@@ -1295,7 +1598,9 @@ def _analyze_cluster_autoscaling(cluster) -> ClusterAutoscalingAnalysis:
 def get_autoscaling_recommendations(
     ws: Dependency.Client,
     config: Dependency.Config,
+    request: Request,
     include_no_issues: Annotated[bool, Query()] = False,
+    top: Annotated[int | None, Query(ge=1)] = None,
 ) -> list[ClusterAutoscalingAnalysis]:
     """Analyze autoscaling configuration across all clusters and provide recommendations.
 
@@ -1309,31 +1614,90 @@ def get_autoscaling_recommendations(
 
     Args:
         include_no_issues: If True, include clusters with no autoscaling issues.
+        top: If set, return only the top N clusters by potential savings.
+
+    Send an "Accept: application/x-ndjson" header to stream one analysis per line.
     """
     logger.info("Analyzing autoscaling configurations for all clusters")
 
     clusters = _list_clusters_limited(ws, limit=100)
-    analyses = []
-
-    for cluster in clusters:
-        try:
-            analysis = _analyze_cluster_autoscaling(cluster)
-
-            # Only include if there are issues or user wants all clusters
-            if analysis.total_issues > 0 or include_no_issues:
-                analyses.append(analysis)
-
-        except Exception as e:
-            logger.warning(f"Could not analyze cluster {cluster.cluster_id} for autoscaling: {e}")
-            continue
+    analyses = [
+        analysis
+        for analysis in _analyze_clusters(clusters, _analyze_cluster_autoscaling, "autoscaling")
+        # Only include if there are issues or user wants all clusters
+        if analysis.total_issues > 0 or include_no_issues
+    ]
 
     # Sort by potential savings (highest first)
-    analyses.sort(key=lambda x: x.total_potential_savings_percent, reverse=True)
+    if top:
+        analyses = heapq.nlargest(top, analyses, key=attrgetter("total_potential_savings_percent"))
+    else:
+        analyses.sort(key=attrgetter("total_potential_savings_percent"), reverse=True)
 
     logger.info(f"Analyzed {len(clusters)} clusters, {len(analyses)} have autoscaling recommendations")
+    if _wants_ndjson(request):
+        return _ndjson_response(analyses)
     return analyses
 
 
+@router.get("/all-recommendations", response_model=AllRecommendations)
+def get_all_recommendations(
+    ws: Dependency.Client,
+    config: Dependency.Config,
+    include_no_issues: Annotated[bool, Query()] = False,
+    include_terminated: Annotated[bool, Query()] = False,
+) -> AllRecommendations:
+    """Run the Spark config, cost and autoscaling analyses in a single request.
+
+    Returns the same lists as the three individual endpoints, so a dashboard
+    showing all of them needs one request and reuses their cached listings.
+
+    Args:
+        include_no_issues: If True, include clusters with no issues in every list.
+        include_terminated: If True, also run the Spark config and cost analyses
+            on terminated/errored clusters.
+    """
+    logger.info("Analyzing Spark config, cost and autoscaling for all clusters")
+
+    # Same listings as the individual endpoints: the Spark config and cost
+    # analyses filter states server-side, autoscaling looks at every cluster
+    config_clusters = _list_clusters_limited(
+        ws, limit=100, states=None if include_terminated else _ACTIVE_STATES
+    )
+    clusters = _list_clusters_limited(ws, limit=100)
+    spark: list[ClusterSparkConfigAnalysis] = []
+    cost: list[ClusterCostAnalysis] = []
+    autoscaling: list[ClusterAutoscalingAnalysis] = []
+
+    for cluster in config_clusters:
+        signature = _cluster_config_signature(cluster)
+
+        analysis = _run_analyzer(cluster, signature, _analyze_cluster_spark_config, "spark config")
+        if analysis is not None and (analysis.total_issues > 0 or include_no_issues):
+            spark.append(analysis)
+
+        analysis = _run_analyzer(cluster, signature, _analyze_cluster_cost, "cost")
+        if analysis is not None and (analysis.total_recommendations > 0 or include_no_issues):
+            cost.append(analysis)
+
+    for cluster in clusters:
+        signature = _cluster_config_signature(cluster)
+        analysis = _run_analyzer(cluster, signature, _analyze_cluster_autoscaling, "autoscaling")
+        if analysis is not None and (analysis.total_issues > 0 or include_no_issues):
+            autoscaling.append(analysis)
+
+    # Same ordering as the individual endpoints
+    spark.sort(key=attrgetter("total_issues"), reverse=True)
+    cost.sort(key=attrgetter("total_potential_savings_percent"), reverse=True)
+    autoscaling.sort(key=attrgetter("total_potential_savings_percent"), reverse=True)
+
+    logger.info(
+        f"Analyzed {len(clusters)} clusters: {len(spark)} spark config, "
+        f"{len(cost)} cost, {len(autoscaling)} autoscaling recommendations"
+    )
+    return AllRecommendations(spark=spark, cost=cost, autoscaling=autoscaling)
+
+
 # --- Node Type Instance Patterns ---
 # Used to classify instance types by category
 
@@ -1361,105 +1725,136 @@ GCP_INSTANCE_PATTERNS = {
     NodeTypeCategory.STORAGE_OPTIMIZED: ["n2-"],
 }
 
+# Instance family/series prefix -> category, built once from the tables above
+_AWS_FAMILY_TO_CATEGORY = {
+    prefix.lower(): cat for cat, prefixes in AWS_INSTANCE_PATTERNS.items() for prefix in prefixes
+}
+_AZURE_SERIES_TO_CATEGORY = {
+    prefix.lower().removeprefix("standard_"): cat
+    for cat, prefixes in AZURE_INSTANCE_PATTERNS.items() for prefix in prefixes
+}
+_GCP_SERIES_TO_CATEGORY = {
+    prefix.lower(): cat for cat, prefixes in GCP_INSTANCE_PATTERNS.items() for prefix in prefixes
+}
+
+# Node type fields: generation/size (AWS), vCPU/generation/GPUs (Azure), vCPU/GPUs (GCP)
+_AWS_INSTANCE_RE = re.compile(r'[a-z]+(?P<gen>\d+[a-z]?)?[^.]*(?:\.(?P<size>\d*x?large|metal))?')
+_AZURE_NUM_RE = re.compile(r'(\d+)')
+_AZURE_GEN_RE = re.compile(r'_v(\d+)')
+_AZURE_NC_RE = re.compile(r'NC(\d+)')
+_GCP_VCPU_RE = re.compile(r'-(\d+)$')
+_GCP_HIGHGPU_RE = re.compile(r'highgpu-(\d+)')
+
+# Spec for clusters with no node type set
+_UNKNOWN_NODE_TYPE_SPEC = NodeTypeSpec(instance_type="unknown", category=NodeTypeCategory.UNKNOWN)
+
+# Rough AWS vCPU count per instance size
+_AWS_SIZE_VCPU_MAP = {
+    "large": 2, "xlarge": 4, "2xlarge": 8, "4xlarge": 16,
+    "8xlarge": 32, "12xlarge": 48, "16xlarge": 64,
+    "24xlarge": 96, "metal": 192,
+}
 
+# AWS GPU counts, first match wins:
+# (family substring, GPU count, size with more GPUs, GPU count at that size)
+_AWS_GPU_COUNT_RULES = (
+    ("p4", 8, None, None),  # p4d.24xlarge
+    ("p5", 8, None, None),  # p5.48xlarge
+    ("g5", 1, "12xlarge", 4),
+    ("g4", 1, "12xlarge", 4),
+    ("p3", 4, "16xlarge", 8),
+)
+
+
+def _node_type_category(node_type_lower: str, cloud_provider: str) -> NodeTypeCategory:
+    """Look up the category of a lowercased node type from its family/series prefix."""
+    if cloud_provider == "azure":
+        # Standard_E16s_v3 -> "e", Standard_NC6 -> "nc"
+        if not node_type_lower.startswith("standard_"):
+            return NodeTypeCategory.UNKNOWN
+        series = node_type_lower[len("standard_"):]
+        category = _AZURE_SERIES_TO_CATEGORY.get(series[:2])
+        if category is None:
+            category = _AZURE_SERIES_TO_CATEGORY.get(series[:1], NodeTypeCategory.UNKNOWN)
+        return category
+
+    if cloud_provider == "gcp":
+        # n2-highmem-16 -> "n2-highmem", falling back to the bare series "n2-"
+        series, _, rest = node_type_lower.partition("-")
+        category = _GCP_SERIES_TO_CATEGORY.get(f"{series}-{rest.split('-', 1)[0]}")
+        if category is None:
+            category = _GCP_SERIES_TO_CATEGORY.get(f"{series}-", NodeTypeCategory.UNKNOWN)
+        return category
+
+    # AWS (also the default): family is the token before ".", and variants
+    # such as g4dn, r5d or x2idn extend a base family (g4, r5, x2)
+    family = node_type_lower.split(".", 1)[0]
+    for end in range(len(family), 1, -1):
+        category = _AWS_FAMILY_TO_CATEGORY.get(family[:end])
+        if category is not None:
+            return category
+    return NodeTypeCategory.UNKNOWN
+
+
+@lru_cache(maxsize=1024)
 def _parse_node_type(node_type: str | None, cloud_provider: str) -> NodeTypeSpec:
-    """Parse a node type string and extract its properties."""
+    """Parse a node type string and extract its properties (memoized; returns a frozen spec)."""
     if not node_type:
-        return NodeTypeSpec(
-            instance_type="unknown",
-            category=NodeTypeCategory.UNKNOWN,
-        )
+        return _UNKNOWN_NODE_TYPE_SPEC
 
     node_type_lower = node_type.lower()
-    category = NodeTypeCategory.UNKNOWN
+    category = _node_type_category(node_type_lower, cloud_provider)
     generation = None
     size = None
     vcpus = None
     memory_gb = None
     gpu_count = None
 
-    # Select patterns based on cloud provider
-    if cloud_provider == "aws":
-        patterns = AWS_INSTANCE_PATTERNS
-    elif cloud_provider == "azure":
-        patterns = AZURE_INSTANCE_PATTERNS
-    elif cloud_provider == "gcp":
-        patterns = GCP_INSTANCE_PATTERNS
-    else:
-        patterns = AWS_INSTANCE_PATTERNS  # Default to AWS patterns
-
-    # Determine category
-    for cat, prefixes in patterns.items():
-        for prefix in prefixes:
-            prefix_lower = prefix.lower()
-            if node_type_lower.startswith(prefix_lower) or prefix_lower in node_type_lower:
-                category = cat
-                break
-        if category != NodeTypeCategory.UNKNOWN:
-            break
-
     # Extract AWS-specific info
     if cloud_provider == "aws":
-        # Parse generation (e.g., r5 -> 5, c6i -> 6i)
-        import re
-        gen_match = re.search(r'[a-z](\d+[a-z]?)', node_type_lower)
-        if gen_match:
-            generation = gen_match.group(1)
-
-        # Parse size (e.g., xlarge, 2xlarge, 4xlarge)
-        size_match = re.search(r'\.(\d*x?large|metal)', node_type_lower)
-        if size_match:
-            size = size_match.group(1)
+        # Parse generation and size in one match (e.g., r5.xlarge -> 5, xlarge; c6i.2xlarge -> 6i, 2xlarge)
+        aws_match = _AWS_INSTANCE_RE.match(node_type_lower)
+        if aws_match:
+            generation = aws_match["gen"]
+            size = aws_match["size"]
 
         # Estimate vCPUs from size (rough mapping)
-        size_vcpu_map = {
-            "large": 2, "xlarge": 4, "2xlarge": 8, "4xlarge": 16,
-            "8xlarge": 32, "12xlarge": 48, "16xlarge": 64,
-            "24xlarge": 96, "metal": 192,
-        }
-        if size in size_vcpu_map:
-            vcpus = size_vcpu_map[size]
+        vcpus = _AWS_SIZE_VCPU_MAP.get(size)
 
         # Check for GPU instances
         if category == NodeTypeCategory.GPU:
-            if "p4" in node_type_lower or "p5" in node_type_lower:
-                gpu_count = 8  # p4d.24xlarge, p5.48xlarge
-            elif "g5" in node_type_lower:
-                gpu_count = 4 if "12xlarge" in node_type_lower else 1
-            elif "g4" in node_type_lower:
-                gpu_count = 4 if "12xlarge" in node_type_lower else 1
-            elif "p3" in node_type_lower:
-                gpu_count = 8 if "16xlarge" in node_type_lower else 4
+            for marker, count, big_size, big_count in _AWS_GPU_COUNT_RULES:
+                if marker in node_type_lower:
+                    gpu_count = big_count if big_size and big_size in node_type_lower else count
+                    break
 
     elif cloud_provider == "azure":
         # Parse Azure instance info
-        import re
         # Azure format: Standard_E16s_v3, Standard_NC6
-        size_match = re.search(r'(\d+)', node_type)
+        size_match = _AZURE_NUM_RE.search(node_type)
         if size_match:
             vcpus = int(size_match.group(1))
 
-        gen_match = re.search(r'_v(\d+)', node_type)
+        gen_match = _AZURE_GEN_RE.search(node_type)
         if gen_match:
             generation = f"v{gen_match.group(1)}"
 
         if category == NodeTypeCategory.GPU:
             if "NC" in node_type:
-                gpu_match = re.search(r'NC(\d+)', node_type)
+                gpu_match = _AZURE_NC_RE.search(node_type)
                 if gpu_match:
                     gpu_count = int(gpu_match.group(1)) // 6  # NC6 = 1 GPU, NC24 = 4 GPUs
 
     elif cloud_provider == "gcp":
         # Parse GCP instance info
-        import re
         # GCP format: n2-standard-8, a2-highgpu-1g
-        vcpu_match = re.search(r'-(\d+)$', node_type)
+        vcpu_match = _GCP_VCPU_RE.search(node_type)
         if vcpu_match:
             vcpus = int(vcpu_match.group(1))
 
         if category == NodeTypeCategory.GPU:
             if "highgpu" in node_type_lower:
-                gpu_match = re.search(r'highgpu-(\d+)', node_type_lower)
+                gpu_match = _GCP_HIGHGPU_RE.search(node_type_lower)
                 if gpu_match:
                     gpu_count = int(gpu_match.group(1))
 
@@ -1474,57 +1869,104 @@ def _parse_node_type(node_type: str | None, cloud_provider: str) -> NodeTypeSpec
     )
 
 
+# Static implementation steps shared by every node type recommendation of a kind
+_STEPS_GPU_TO_CPU = (
+    "Confirm workload doesn't require GPU (ML training, deep learning)",
+    "For SQL/analytics: use Photon with standard instances",
+    "For ETL: use r5/r6i (memory-optimized) or m5/m6i (general purpose)",
+    "GPU savings of 70%+ are typical when switching to CPU instances",
+)
+
+_STEPS_MATCH_FAMILIES = (
+    "Review why different families are used",
+    "For most workloads, matching families simplifies tuning",
+    "Exception: memory-heavy collect() may justify larger driver",
+)
+
+_STEPS_SQL_MEMORY_OPTIMIZED = (
+    "For SQL/analytics: consider r5/r6i instances",
+    "Memory-optimized instances improve query cache hit rates",
+    "If using Photon, it can run on any instance type",
+)
+
+
 def _analyze_cluster_node_type(cluster) -> ClusterNodeTypeAnalysis:
     """Analyze node type configuration for a cluster and generate recommendations."""
     cluster_id = cluster.cluster_id
     cluster_name = cluster.cluster_name or "Unnamed Cluster"
     cluster_type = _classify_cluster(cluster)
-    cloud_provider = _detect_cloud_provider(cluster)
+    cloud_provider = _get_cloud(cluster)[0]
 
     worker_node_type = cluster.node_type_id
     driver_node_type = cluster.driver_node_type_id or worker_node_type
+    uses_same_driver_worker = driver_node_type == worker_node_type
+
+    # Get worker count
+    num_workers = _effective_workers(cluster)
+
+    # Without any node type there is nothing to right-size
+    if not worker_node_type and not driver_node_type:
+        return ClusterNodeTypeAnalysis(
+            cluster_id=cluster_id,
+            cluster_name=cluster_name,
+            cluster_type=cluster_type,
+            cloud_provider=cloud_provider,
+            worker_node_type=worker_node_type,
+            worker_node_category=NodeTypeCategory.UNKNOWN,
+            worker_spec=_UNKNOWN_NODE_TYPE_SPEC,
+            driver_node_type=driver_node_type,
+            driver_node_category=NodeTypeCategory.UNKNOWN,
+            driver_spec=_UNKNOWN_NODE_TYPE_SPEC,
+            num_workers=num_workers,
+            uses_same_driver_worker=uses_same_driver_worker,
+            total_issues=0,
+            total_potential_savings_percent=0.0,
+            recommendations=[],
+        )
 
     # Parse node type specs
     worker_spec = _parse_node_type(worker_node_type, cloud_provider)
     driver_spec = _parse_node_type(driver_node_type, cloud_provider)
 
-    uses_same_driver_worker = driver_node_type == worker_node_type
-
-    # Get worker count
-    num_workers = cluster.num_workers or 0
-    if cluster.autoscale:
-        num_workers = (cluster.autoscale.min_workers + cluster.autoscale.max_workers) // 2
+    # Spec fields read by several issue checks below
+    w_cat = worker_spec.category
+    d_cat = driver_spec.category
+    w_cat_name = w_cat.value
+    d_cat_name = d_cat.value
+    w_vcpus = worker_spec.vcpus
+    d_vcpus = driver_spec.vcpus
+    w_gen = worker_spec.generation
+    w_size = worker_spec.size
 
     recommendations = []
+    total_savings = 0.0
 
     # --- Issue 1: Oversized Driver ---
     # Driver larger than workers (often unnecessary)
-    if driver_spec.vcpus and worker_spec.vcpus:
-        if driver_spec.vcpus > worker_spec.vcpus * 2:
+    if d_vcpus and w_vcpus:
+        if d_vcpus > w_vcpus * 2:
             recommendations.append(NodeTypeRecommendation(
                 cluster_id=cluster_id,
                 cluster_name=cluster_name,
                 issue_type=NodeTypeIssueType.OVERSIZED_DRIVER,
-                current_config=f"Driver: {driver_node_type} ({driver_spec.vcpus} vCPUs), Workers: {worker_node_type} ({worker_spec.vcpus} vCPUs)",
+                current_config=f"Driver: {driver_node_type} ({d_vcpus} vCPUs), Workers: {worker_node_type} ({w_vcpus} vCPUs)",
                 recommended_config=f"Match driver to worker: {worker_node_type}",
                 estimated_savings_percent=15.0,
                 severity=NodeTypeSeverity.MEDIUM,
-                reason=f"Driver ({driver_spec.vcpus} vCPUs) is significantly larger than workers ({worker_spec.vcpus} vCPUs). Unless collecting large datasets to driver, matching driver to worker size is more cost-effective. The driver mainly coordinates tasks and handles collect() operations.",
-                implementation_steps=[
+                reason=f"Driver ({d_vcpus} vCPUs) is significantly larger than workers ({w_vcpus} vCPUs). Unless collecting large datasets to driver, matching driver to worker size is more cost-effective. The driver mainly coordinates tasks and handles collect() operations.",
+                implementation_steps=(
                     "Evaluate if driver needs extra capacity (large collect(), broadcast variables)",
                     f"If not, set driver_node_type_id to {worker_node_type}",
-                    "This reduces driver cost while maintaining worker performance"
-                ],
+                    "This reduces driver cost while maintaining worker performance",
+                ),
             ))
+            total_savings += 15.0
 
     # --- Issue 2: GPU for Non-ML Workloads ---
-    if worker_spec.category == NodeTypeCategory.GPU:
-        if cluster_type not in [ClusterType.MODELS]:
+    if w_cat is NodeTypeCategory.GPU:
+        if cluster_type is not ClusterType.MODELS:
             # Check if Photon (which uses GPU) is indicated
-            spark_version = cluster.spark_version or ""
-            is_photon = "photon" in spark_version.lower()
-
-            if not is_photon:
+            if not _is_photon_runtime(cluster.spark_version):
                 recommendations.append(NodeTypeRecommendation(
                     cluster_id=cluster_id,
                     cluster_name=cluster_name,
@@ -1534,99 +1976,90 @@ def _analyze_cluster_node_type(cluster) -> ClusterNodeTypeAnalysis:
                     estimated_savings_percent=70.0,
                     severity=NodeTypeSeverity.HIGH,
                     reason=f"GPU instances ({worker_node_type}) are used but cluster doesn't appear to be ML-focused and isn't using Photon. GPUs are 3-10x more expensive than CPU instances. For SQL/ETL workloads, memory-optimized (r-series) or compute-optimized (c-series) instances are more cost-effective.",
-                    implementation_steps=[
-                        "Confirm workload doesn't require GPU (ML training, deep learning)",
-                        "For SQL/analytics: use Photon with standard instances",
-                        "For ETL: use r5/r6i (memory-optimized) or m5/m6i (general purpose)",
-                        "GPU savings of 70%+ are typical when switching to CPU instances"
-                    ],
+                    implementation_steps=_STEPS_GPU_TO_CPU,
                 ))
+                total_savings += 70.0
 
     # --- Issue 3: Legacy Instance Generation ---
-    if worker_spec.generation:
-        gen_num = worker_spec.generation[0] if worker_spec.generation else None
+    if w_gen:
+        gen_num = w_gen[0]
         if gen_num and gen_num.isdigit() and int(gen_num) < 5:
             newer_gen = str(int(gen_num) + 2)  # Suggest 2 generations newer
             old_prefix = worker_node_type.split(".")[0] if "." in worker_node_type else worker_node_type[:2]
-            new_type_suggestion = f"{old_prefix[0]}{newer_gen}i.{worker_spec.size}" if worker_spec.size else f"{old_prefix[0]}{newer_gen}i"
+            new_type_suggestion = f"{old_prefix[0]}{newer_gen}i.{w_size}" if w_size else f"{old_prefix[0]}{newer_gen}i"
 
             recommendations.append(NodeTypeRecommendation(
                 cluster_id=cluster_id,
                 cluster_name=cluster_name,
                 issue_type=NodeTypeIssueType.LEGACY_INSTANCE,
-                current_config=f"Instance generation: {worker_spec.generation} ({worker_node_type})",
+                current_config=f"Instance generation: {w_gen} ({worker_node_type})",
                 recommended_config=f"Upgrade to newer generation (e.g., {new_type_suggestion})",
                 estimated_savings_percent=15.0,
                 severity=NodeTypeSeverity.LOW,
-                reason=f"Using older instance generation ({worker_spec.generation}). Newer generations (6th, 7th gen) often provide better price/performance and include improvements like faster networking and better CPU performance at similar or lower prices.",
-                implementation_steps=[
+                reason=f"Using older instance generation ({w_gen}). Newer generations (6th, 7th gen) often provide better price/performance and include improvements like faster networking and better CPU performance at similar or lower prices.",
+                implementation_steps=(
                     "Check AWS/Azure/GCP pricing for newer instance types",
                     f"Consider upgrading from {worker_node_type} to {new_type_suggestion}",
                     "Newer generations often cost the same but perform better",
-                    "Test workload on new instance type before full migration"
-                ],
+                    "Test workload on new instance type before full migration",
+                ),
             ))
+            total_savings += 15.0
 
     # --- Issue 4: Mismatched Driver/Worker Categories ---
     if not uses_same_driver_worker:
-        if driver_spec.category != worker_spec.category and \
-           driver_spec.category != NodeTypeCategory.UNKNOWN and \
-           worker_spec.category != NodeTypeCategory.UNKNOWN:
+        if d_cat is not w_cat and \
+           d_cat is not NodeTypeCategory.UNKNOWN and \
+           w_cat is not NodeTypeCategory.UNKNOWN:
             recommendations.append(NodeTypeRecommendation(
                 cluster_id=cluster_id,
                 cluster_name=cluster_name,
                 issue_type=NodeTypeIssueType.MISMATCHED_DRIVER_WORKER,
-                current_config=f"Driver: {driver_node_type} ({driver_spec.category.value}), Workers: {worker_node_type} ({worker_spec.category.value})",
+                current_config=f"Driver: {driver_node_type} ({d_cat_name}), Workers: {worker_node_type} ({w_cat_name})",
                 recommended_config="Use consistent instance families for driver and workers",
                 estimated_savings_percent=5.0,
                 severity=NodeTypeSeverity.LOW,
-                reason=f"Driver ({driver_spec.category.value}) and workers ({worker_spec.category.value}) use different instance families. While this can be intentional, using the same family often simplifies management and ensures consistent behavior. Consider if the mixed configuration is necessary.",
-                implementation_steps=[
-                    "Review why different families are used",
-                    "For most workloads, matching families simplifies tuning",
-                    "Exception: memory-heavy collect() may justify larger driver"
-                ],
+                reason=f"Driver ({d_cat_name}) and workers ({w_cat_name}) use different instance families. While this can be intentional, using the same family often simplifies management and ensures consistent behavior. Consider if the mixed configuration is necessary.",
+                implementation_steps=_STEPS_MATCH_FAMILIES,
             ))
+            total_savings += 5.0
 
     # --- Issue 5: Overprovisioned for Small Clusters ---
-    if num_workers <= 2 and worker_spec.vcpus and worker_spec.vcpus >= 32:
+    if num_workers <= 2 and w_vcpus and w_vcpus >= 32:
         recommendations.append(NodeTypeRecommendation(
             cluster_id=cluster_id,
             cluster_name=cluster_name,
             issue_type=NodeTypeIssueType.OVERPROVISIONED,
-            current_config=f"{num_workers} workers × {worker_spec.vcpus} vCPUs = {num_workers * worker_spec.vcpus} total vCPUs",
+            current_config=f"{num_workers} workers × {w_vcpus} vCPUs = {num_workers * w_vcpus} total vCPUs",
             recommended_config=f"Use smaller instances with more workers for better parallelism",
             estimated_savings_percent=20.0,
             severity=NodeTypeSeverity.MEDIUM,
-            reason=f"Few workers ({num_workers}) with very large instances ({worker_spec.vcpus} vCPUs each). For distributed workloads, more smaller workers often outperform fewer large workers due to better parallelism and fault tolerance. Consider 4-8 workers with 8-16 vCPU instances.",
-            implementation_steps=[
-                "Calculate total vCPUs needed: current = " + str(num_workers * worker_spec.vcpus if worker_spec.vcpus else "unknown"),
+            reason=f"Few workers ({num_workers}) with very large instances ({w_vcpus} vCPUs each). For distributed workloads, more smaller workers often outperform fewer large workers due to better parallelism and fault tolerance. Consider 4-8 workers with 8-16 vCPU instances.",
+            implementation_steps=(
+                "Calculate total vCPUs needed: current = " + str(num_workers * w_vcpus if w_vcpus else "unknown"),
                 "Redistribute across more workers: e.g., 4x r5.2xlarge instead of 2x r5.8xlarge",
                 "Enable autoscaling to handle variable workloads",
-                "More workers = better parallelism and fault isolation"
-            ],
+                "More workers = better parallelism and fault isolation",
+            ),
         ))
+        total_savings += 20.0
 
     # --- Issue 6: Wrong Category for Workload Type ---
-    if cluster_type == ClusterType.SQL and worker_spec.category == NodeTypeCategory.COMPUTE_OPTIMIZED:
+    if cluster_type is ClusterType.SQL and w_cat is NodeTypeCategory.COMPUTE_OPTIMIZED:
         recommendations.append(NodeTypeRecommendation(
             cluster_id=cluster_id,
             cluster_name=cluster_name,
             issue_type=NodeTypeIssueType.WRONG_CATEGORY,
-            current_config=f"SQL cluster using {worker_spec.category.value} instances",
+            current_config=f"SQL cluster using {w_cat_name} instances",
             recommended_config="Use memory-optimized instances for SQL workloads",
             estimated_savings_percent=10.0,
             severity=NodeTypeSeverity.LOW,
             reason="SQL workloads typically benefit from memory-optimized instances (r-series) for caching and join operations. Compute-optimized instances (c-series) are better for CPU-intensive transformations.",
-            implementation_steps=[
-                "For SQL/analytics: consider r5/r6i instances",
-                "Memory-optimized instances improve query cache hit rates",
-                "If using Photon, it can run on any instance type"
-            ],
+            implementation_steps=_STEPS_SQL_MEMORY_OPTIMIZED,
         ))
+        total_savings += 10.0
 
     # Calculate total potential savings (cap at 80%)
-    total_savings = sum(r.estimated_savings_percent for r in recommendations)
     total_savings = min(80.0, total_savings)
 
     return ClusterNodeTypeAnalysis(
@@ -1635,10 +2068,10 @@ def _analyze_cluster_node_type(cluster) -> ClusterNodeTypeAnalysis:
         cluster_type=cluster_type,
         cloud_provider=cloud_provider,
         worker_node_type=worker_node_type,
-        worker_node_category=worker_spec.category,
+        worker_node_category=w_cat,
         worker_spec=worker_spec,
         driver_node_type=driver_node_type,
-        driver_node_category=driver_spec.category,
+        driver_node_category=d_cat,
         driver_spec=driver_spec,
         num_workers=num_workers,
         uses_same_driver_worker=uses_same_driver_worker,
@@ -1652,7 +2085,9 @@ def _analyze_cluster_node_type(cluster) -> ClusterNodeTypeAnalysis:
 def get_node_type_recommendations(
     ws: Dependency.Client,
     config: Dependency.Config,
+    request: Request,
     include_no_issues: Annotated[bool, Query()] = False,
+    top: Annotated[int | None, Query(ge=1)] = None,
 ) -> list[ClusterNodeTypeAnalysis]:
     """Analyze node type configurations across all clusters and provide recommendations.
 
@@ -1666,26 +2101,27 @@ def get_node_type_recommendations(
 
     Args:
         include_no_issues: If True, include clusters with no node type issues.
+        top: If set, return only the top N clusters by potential savings.
+
+    Send an "Accept: application/x-ndjson" header to stream one analysis per line.
     """
     logger.info("Analyzing node type configurations for all clusters")
 
     clusters = _list_clusters_limited(ws, limit=100)
-    analyses = []
-
-    for cluster in clusters:
-        try:
-            analysis = _analyze_cluster_node_type(cluster)
-
-            # Only include if there are issues or user wants all clusters
-            if analysis.total_issues > 0 or include_no_issues:
-                analyses.append(analysis)
-
-        except Exception as e:
-            logger.warning(f"Could not analyze cluster {cluster.cluster_id} for node types: {e}")
-            continue
+    analyses = [
+        analysis
+        for analysis in _analyze_clusters(clusters, _analyze_cluster_node_type, "node types")
+        # Only include if there are issues or user wants all clusters
+        if analysis.total_issues > 0 or include_no_issues
+    ]
 
     # Sort by potential savings (highest first)
-    analyses.sort(key=lambda x: x.total_potential_savings_percent, reverse=True)
+    if top:
+        analyses = heapq.nlargest(top, analyses, key=attrgetter("total_potential_savings_percent"))
+    else:
+        analyses.sort(key=attrgetter("total_potential_savings_percent"), reverse=True)
 
     logger.info(f"Analyzed {len(clusters)} clusters, {len(analyses)} have node type recommendations")
+    if _wants_ndjson(request):
+        return _ndjson_response(analyses)
     return analyses
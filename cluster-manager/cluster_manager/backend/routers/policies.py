@@ -2,15 +2,19 @@
 
 import json
 from datetime import datetime, timezone
+from operator import attrgetter
+from typing import Annotated
 
-from fastapi import APIRouter, HTTPException
+from databricks.sdk.service.compute import ListClustersFilterBy
+from fastapi import APIRouter, HTTPException, Query
 
 from ..core import Dependency, logger
 from ..models import (
+    CLUSTER_SOURCE_BY_VALUE,
+    CLUSTER_STATE_BY_VALUE,
     AutoScaleConfig,
     ClusterPolicyDetail,
     ClusterPolicySummary,
-    ClusterSource,
     ClusterState,
     ClusterSummary,
     PolicyUsage,
@@ -47,7 +51,7 @@ def list_policies(ws: Dependency.Client) -> list[ClusterPolicySummary]:
             ))
 
         # Sort by name
-        summaries.sort(key=lambda p: p.name)
+        summaries.sort(key=attrgetter("name"))
 
         logger.info(f"Found {len(summaries)} cluster policies")
         return summaries
@@ -58,16 +62,22 @@ def list_policies(ws: Dependency.Client) -> list[ClusterPolicySummary]:
 
 
 @router.get("/{policy_id}", response_model=ClusterPolicyDetail)
-def get_policy(policy_id: str, ws: Dependency.Client) -> ClusterPolicyDetail:
+def get_policy(
+    policy_id: str,
+    ws: Dependency.Client,
+    parse_definition: Annotated[
+        bool, Query(description="Include the parsed definition as definition_json")
+    ] = True,
+) -> ClusterPolicyDetail:
     """Get detailed information about a specific cluster policy."""
     logger.info(f"Getting cluster policy {policy_id}")
 
     try:
         policy = ws.cluster_policies.get(policy_id)
 
-        # Parse definition JSON
+        # Parse definition JSON only when requested; the raw string is always returned
         definition_json = {}
-        if policy.definition:
+        if parse_definition and policy.definition:
             try:
                 definition_json = json.loads(policy.definition)
             except json.JSONDecodeError:
@@ -101,9 +111,11 @@ def get_policy_usage(policy_id: str, ws: Dependency.Client) -> PolicyUsage:
         # Get policy details first
         policy = ws.cluster_policies.get(policy_id)
 
-        # Get all clusters and filter by policy
-        clusters = list(ws.clusters.list())
-        policy_clusters = [c for c in clusters if c.policy_id == policy_id]
+        # Let the clusters API filter by policy instead of listing every cluster
+        policy_clusters = [
+            c for c in ws.clusters.list(filter_by=ListClustersFilterBy(policy_id=policy_id))
+            if c.policy_id == policy_id
+        ]
 
         # Convert to summaries
         cluster_summaries = []
@@ -115,21 +127,13 @@ def get_policy_usage(policy_id: str, ws: Dependency.Client) -> PolicyUsage:
                     max_workers=cluster.autoscale.max_workers,
                 )
 
-            # Map state
+            # Map state and source (unknown values fall back)
             state = ClusterState.UNKNOWN
             if cluster.state:
-                try:
-                    state = ClusterState(cluster.state.value)
-                except ValueError:
-                    pass
-
-            # Map source
+                state = CLUSTER_STATE_BY_VALUE.get(cluster.state.value, ClusterState.UNKNOWN)
             source = None
             if cluster.cluster_source:
-                try:
-                    source = ClusterSource(cluster.cluster_source.value)
-                except ValueError:
-                    pass
+                source = CLUSTER_SOURCE_BY_VALUE.get(cluster.cluster_source.value)
 
             cluster_summaries.append(ClusterSummary(
                 cluster_id=cluster.cluster_id,
@@ -1,6 +1,7 @@
 """Workspace information API router."""
 
 import os
+from functools import lru_cache
 
 from pydantic import BaseModel
 
@@ -15,17 +16,20 @@ class WorkspaceInfo(BaseModel):
     org_id: str | None = None
 
 
+# Environment variable name fragments shown by the debug endpoint, and those masked
+_DEBUG_ENV_MARKERS = ("DATABRICKS", "DB_", "WORKSPACE")
+_SENSITIVE_ENV_MARKERS = ("TOKEN", "SECRET", "PASSWORD")
+
+
 @router.get("/workspace/debug")
 def debug_workspace_env(ws: Dependency.Client) -> dict:
     """Debug endpoint to show workspace-related environment variables."""
-    env_vars = {}
-    for key, value in os.environ.items():
-        if "DATABRICKS" in key or "DB_" in key or "WORKSPACE" in key:
-            # Mask sensitive values
-            if "TOKEN" in key or "SECRET" in key or "PASSWORD" in key:
-                env_vars[key] = "***MASKED***"
-            else:
-                env_vars[key] = value
+    env_vars = {
+        # Mask sensitive values
+        key: "***MASKED***" if any(marker in key for marker in _SENSITIVE_ENV_MARKERS) else value
+        for key, value in os.environ.items()
+        if any(marker in key for marker in _DEBUG_ENV_MARKERS)
+    }
     return {
         "env_vars": env_vars,
         "config_host": ws.config.host,
@@ -33,15 +37,15 @@ def debug_workspace_env(ws: Dependency.Client) -> dict:
     }
 
 
-@router.get("/workspace/info", response_model=WorkspaceInfo)
-def get_workspace_info(ws: Dependency.Client) -> WorkspaceInfo:
-    """Get workspace information including host URL."""
+@lru_cache(maxsize=8)
+def _resolve_workspace_info(config_host: str | None) -> WorkspaceInfo:
+    """Resolve host and org_id (memoized; inputs only change across process restarts)."""
     # Try multiple sources for workspace host
     host = None
 
     # 1. Try WorkspaceClient config
-    if ws.config.host:
-        host = ws.config.host
+    if config_host:
+        host = config_host
         logger.debug(f"Got host from WorkspaceClient config: {host}")
 
     # 2. Try DATABRICKS_HOST environment variable
@@ -79,5 +83,12 @@ def get_workspace_info(ws: Dependency.Client) -> WorkspaceInfo:
     except Exception:
         pass
 
-    logger.info(f"Returning workspace info: host={host}, org_id={org_id}")
     return WorkspaceInfo(host=host, org_id=org_id)
+
+
+@router.get("/workspace/info", response_model=WorkspaceInfo)
+def get_workspace_info(ws: Dependency.Client) -> WorkspaceInfo:
+    """Get workspace information including host URL."""
+    info = _resolve_workspace_info(ws.config.host)
+    logger.info(f"Returning workspace info: host={info.host}, org_id={info.org_id}")
+    return info
@@ -471,6 +471,23 @@ export function useAutoscalingRecommendations(includeNoIssues = false) {
   });
 }
 
+export interface AllRecommendations {
+  spark: ClusterSparkConfigAnalysis[];
+  cost: ClusterCostAnalysis[];
+  autoscaling: ClusterAutoscalingAnalysis[];
+}
+
+export function useAllRecommendations(includeNoIssues = false) {
+  return useQuery({
+    queryKey: ["all-recommendations", includeNoIssues],
+    queryFn: () =>
+      fetchApi<AllRecommendations>(
+        `/api/optimization/all-recommendations?include_no_issues=${includeNoIssues}`
+      ),
+    refetchInterval: 60000,
+  });
+}
+
 // Node Type Right-Sizing types
 export type NodeTypeCategory =
   | "memory_optimized"
@@ -31,14 +31,12 @@ import {
 } from "lucide-react";
 
 import {
-  useAutoscalingRecommendations,
-  useCostRecommendations,
+  useAllRecommendations,
   useJobRecommendations,
   useNodeTypeRecommendations,
   useOptimizationSummary,
   useOversizedClusters,
   useScheduleRecommendations,
-  useSparkConfigRecommendations,
   type AutoscalingIssueType,
   type AutoscalingSeverity,
   type ClusterAutoscalingAnalysis,
@@ -1207,9 +1205,13 @@ function OptimizationPage() {
   const { data: oversizedClusters, isLoading: oversizedLoading } = useOversizedClusters(5);
   const { data: jobRecommendations, isLoading: jobsLoading } = useJobRecommendations();
   const { data: scheduleRecommendations, isLoading: scheduleLoading } = useScheduleRecommendations();
-  const { data: sparkConfigData, isLoading: sparkConfigLoading } = useSparkConfigRecommendations();
-  const { data: costData, isLoading: costLoading } = useCostRecommendations();
-  const { data: autoscalingData, isLoading: autoscalingLoading } = useAutoscalingRecommendations();
+  const { data: allRecommendations, isLoading: recommendationsLoading } = useAllRecommendations();
+  const sparkConfigData = allRecommendations?.spark;
+  const costData = allRecommendations?.cost;
+  const autoscalingData = allRecommendations?.autoscaling;
+  const sparkConfigLoading = recommendationsLoading;
+  const costLoading = recommendationsLoading;
+  const autoscalingLoading = recommendationsLoading;
   const { data: nodeTypeData, isLoading: nodeTypeLoading } = useNodeTypeRecommendations();
 
   // Sorting state for oversized clusters table
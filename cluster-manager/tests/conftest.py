@@ -0,0 +1,127 @@
+"""Shared fixtures: an in-memory workspace and a test client for the API routers."""
+
+from types import SimpleNamespace
+
+import pytest
+from databricks.sdk.service.compute import (
+    AutoScale,
+    AwsAttributes,
+    AwsAvailability,
+    ClusterDetails,
+    ClusterSource,
+    State,
+)
+from databricks.sdk.service.sql import StatementState
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from cluster_manager.backend import core
+from cluster_manager.backend.core import AppConfig, get_config, get_ws
+from cluster_manager.backend.routers import optimization, optimization_router
+
+
+class FakeClusters:
+    """Clusters API that serves a fixed list and honours the state filter."""
+
+    def __init__(self, clusters: list[ClusterDetails]) -> None:
+        self._clusters = clusters
+        self.list_calls = 0
+
+    def list(self, filter_by=None, page_size=None):
+        self.list_calls += 1
+        states = set(filter_by.cluster_states) if filter_by and filter_by.cluster_states else None
+        return iter([c for c in self._clusters if states is None or c.state in states])
+
+
+class FakeStatementExecution:
+    """Statement execution API that returns fixed rows and records each call."""
+
+    def __init__(self, columns: list[str], rows: list[list]) -> None:
+        self._columns = columns
+        self._rows = rows
+        self.calls: list[dict] = []
+
+    def execute_statement(self, **kwargs):
+        self.calls.append(kwargs)
+        return SimpleNamespace(
+            status=SimpleNamespace(state=StatementState.SUCCEEDED, error=None),
+            manifest=SimpleNamespace(
+                schema=SimpleNamespace(columns=[SimpleNamespace(name=c) for c in self._columns])
+            ),
+            result=SimpleNamespace(data_array=self._rows),
+        )
+
+
+class FakeWorkspace:
+    """Just enough of WorkspaceClient for the optimization endpoints."""
+
+    def __init__(
+        self,
+        clusters: list[ClusterDetails],
+        host: str = "https://test.databricks.com",
+        statement_execution: FakeStatementExecution | None = None,
+    ):
+        self.config = SimpleNamespace(host=host)
+        self.clusters = FakeClusters(clusters)
+        self.statement_execution = statement_execution or FakeStatementExecution([], [])
+
+
+def make_cluster(
+    cluster_id: str,
+    state: State = State.RUNNING,
+    num_workers: int = 8,
+    autoscale: tuple[int, int] | None = None,
+    **kwargs,
+) -> ClusterDetails:
+    """Build an on-demand AWS cluster with AQE disabled and no auto-termination."""
+    fields = {
+        "cluster_name": f"cluster-{cluster_id}",
+        "cluster_source": ClusterSource.UI,
+        "spark_version": "13.3.x-scala2.12",
+        "node_type_id": "r5.xlarge",
+        "autotermination_minutes": 0,
+        "spark_conf": {"spark.sql.adaptive.enabled": "false"},
+        "aws_attributes": AwsAttributes(availability=AwsAvailability.ON_DEMAND),
+        **kwargs,
+    }
+    if autoscale:
+        fields["autoscale"] = AutoScale(min_workers=autoscale[0], max_workers=autoscale[1])
+    return ClusterDetails(
+        cluster_id=cluster_id,
+        state=state,
+        num_workers=None if autoscale else num_workers,
+        **fields,
+    )
+
+
+@pytest.fixture(autouse=True)
+def _clear_caches():
+    """Module-level caches outlive a request; start every test cold."""
+    for cache in (
+        optimization._cluster_list_cache,
+        optimization._analysis_cache,
+        optimization._summary_cache,
+        core._warehouse_cache,
+        core._user_client_cache,
+    ):
+        cache.clear()
+    yield
+
+
+@pytest.fixture
+def make_client():
+    """Build a TestClient for one router (optimization by default) backed by a fake workspace."""
+
+    def _make(
+        workspace,
+        config: AppConfig | None = None,
+        router: APIRouter = optimization_router,
+    ) -> TestClient:
+        config = config or AppConfig()
+        app = FastAPI()
+        app.include_router(router)
+        app.dependency_overrides[get_ws] = lambda: workspace
+        app.dependency_overrides[get_config] = lambda: config
+        return TestClient(app)
+
+    return _make
@@ -0,0 +1,73 @@
+"""Tests for the billing router."""
+
+from cluster_manager.backend.core import AppConfig
+from cluster_manager.backend.routers import billing_router
+
+from .conftest import FakeStatementExecution, FakeWorkspace, make_cluster
+
+
+def _client(make_client, statements: FakeStatementExecution, clusters=()):
+    return make_client(
+        FakeWorkspace(list(clusters), statement_execution=statements),
+        AppConfig(sql_warehouse_id="wh-1"),
+        router=billing_router,
+    )
+
+
+def test_days_window_is_bound_as_a_parameter(make_client):
+    statements = FakeStatementExecution(
+        ["total_dbu", "period_start", "period_end"], [["100", "2026-10-01", "2026-10-07"]]
+    )
+    client = _client(make_client, statements)
+
+    response = client.get("/api/billing/summary", params={"days": 7})
+
+    assert response.status_code == 200
+    assert response.json()["total_dbu"] == 100.0
+    call = statements.calls[0]
+    assert call["warehouse_id"] == "wh-1"
+    assert "DATE_SUB(CURRENT_DATE(), :days)" in call["statement"]
+    assert [(p.name, p.value, p.type) for p in call["parameters"]] == [("days", "7", "INT")]
+
+
+def test_statement_text_is_the_same_for_every_window(make_client):
+    statements = FakeStatementExecution(["total_dbu", "period_start", "period_end"], [])
+    client = _client(make_client, statements)
+
+    client.get("/api/billing/summary", params={"days": 7})
+    client.get("/api/billing/summary", params={"days": 30})
+
+    first, second = statements.calls
+    assert first["statement"] == second["statement"]
+    assert [p.value for p in first["parameters"]] == ["7"]
+    assert [p.value for p in second["parameters"]] == ["30"]
+
+
+def test_top_consumer_percentages_use_the_window_total(make_client):
+    # The grand total covers every cluster, not only the rows kept by LIMIT
+    statements = FakeStatementExecution(
+        ["cluster_id", "total_dbu", "grand_total_dbu"],
+        [["a", "50", "200"], ["b", "30", "200"]],
+    )
+    client = _client(make_client, statements, [make_cluster("a"), make_cluster("b")])
+
+    response = client.get("/api/billing/top-consumers", params={"limit": 2, "days": 14})
+
+    assert response.status_code == 200
+    consumers = response.json()
+    assert [c["cluster_id"] for c in consumers] == ["a", "b"]
+    assert [c["cluster_name"] for c in consumers] == ["cluster-a", "cluster-b"]
+    assert [c["percentage_of_total"] for c in consumers] == [25.0, 15.0]
+    assert consumers[0]["estimated_cost_usd"] == 7.5
+
+    # One statement for both the breakdown and the total
+    assert len(statements.calls) == 1
+    assert "OVER ()" in statements.calls[0]["statement"]
+    assert [p.value for p in statements.calls[0]["parameters"]] == ["14"]
+
+
+def test_top_consumers_without_usage_is_empty(make_client):
+    statements = FakeStatementExecution(["cluster_id", "total_dbu", "grand_total_dbu"], [])
+    client = _client(make_client, statements)
+
+    assert client.get("/api/billing/top-consumers").json() == []
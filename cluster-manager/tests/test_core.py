@@ -0,0 +1,191 @@
+"""Tests for shared core utilities."""
+
+import hashlib
+from types import SimpleNamespace
+
+import pytest
+from databricks.sdk.service.sql import State as WarehouseState
+
+from cluster_manager.backend import core
+from cluster_manager.backend.core import (
+    AppConfig,
+    TTLCache,
+    get_user_ws,
+    get_warehouse_id,
+    invalidate_warehouse,
+)
+
+
+class _Warehouses:
+    def __init__(self, warehouses):
+        self.warehouses = warehouses
+        self.list_calls = 0
+
+    def list(self):
+        self.list_calls += 1
+        return iter(self.warehouses)
+
+
+def _warehouse(wh_id: str, state: WarehouseState, serverless: bool = False):
+    return SimpleNamespace(
+        id=wh_id, name=wh_id, state=state,
+        enable_serverless_compute=serverless, warehouse_type=None,
+    )
+
+
+def _workspace(*warehouses):
+    return SimpleNamespace(
+        config=SimpleNamespace(host="https://test.databricks.com"),
+        warehouses=_Warehouses(list(warehouses)),
+    )
+
+
+def test_get_warehouse_id_prefers_running_serverless_and_caches():
+    ws = _workspace(
+        _warehouse("classic", WarehouseState.RUNNING),
+        _warehouse("serverless", WarehouseState.RUNNING, serverless=True),
+    )
+    config = AppConfig(sql_warehouse_id=None)
+
+    assert get_warehouse_id(ws, config) == "serverless"
+    assert get_warehouse_id(ws, config) == "serverless"
+    assert ws.warehouses.list_calls == 1
+
+
+def test_invalidate_warehouse_forces_rediscovery():
+    ws = _workspace(_warehouse("first", WarehouseState.RUNNING))
+    config = AppConfig(sql_warehouse_id=None)
+    assert get_warehouse_id(ws, config) == "first"
+
+    ws.warehouses.warehouses = [_warehouse("second", WarehouseState.RUNNING)]
+    invalidate_warehouse(ws)
+
+    assert get_warehouse_id(ws, config) == "second"
+    assert ws.warehouses.list_calls == 2
+
+
+def test_configured_warehouse_skips_discovery():
+    ws = _workspace(_warehouse("discovered", WarehouseState.RUNNING))
+
+    assert get_warehouse_id(ws, AppConfig(sql_warehouse_id="configured")) == "configured"
+    assert ws.warehouses.list_calls == 0
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_discovered_warehouse_expires_after_a_minute(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(core.time, "monotonic", clock)
+    ws = _workspace(_warehouse("stopped", WarehouseState.STOPPED))
+    config = AppConfig(sql_warehouse_id=None)
+    assert get_warehouse_id(ws, config) == "stopped"
+
+    ws.warehouses.warehouses.append(_warehouse("running", WarehouseState.RUNNING))
+    clock.now += 59
+    assert get_warehouse_id(ws, config) == "stopped"
+
+    clock.now += 1
+    assert get_warehouse_id(ws, config) == "running"
+    assert ws.warehouses.list_calls == 2
+
+
+def test_ttl_cache_expires_entries(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(core.time, "monotonic", clock)
+    cache = TTLCache(ttl=30)
+
+    cache.set("key", "value")
+    clock.now += 29.9
+    assert cache.get("key") == "value"
+
+    clock.now += 0.1
+    assert cache.get("key") is None
+    assert cache.get("key", "default") == "default"
+
+
+def test_ttl_cache_set_refreshes_expiry(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(core.time, "monotonic", clock)
+    cache = TTLCache(ttl=30)
+
+    cache.set("key", "old")
+    clock.now += 20
+    cache.set("key", "new")
+    clock.now += 20
+
+    assert cache.get("key") == "new"
+
+
+def test_ttl_cache_evicts_oldest_entry_when_full():
+    cache = TTLCache(ttl=60, maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    cache.set("a", 10)  # overwriting an existing key never evicts
+    assert cache.get("b") == 2
+
+    cache.set("c", 3)
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert cache.get("c") == 3
+
+
+def test_ttl_cache_pop_and_clear():
+    cache = TTLCache(ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    cache.pop("a")
+    cache.pop("missing")
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+
+    cache.clear()
+    assert cache.get("b") is None
+
+
+class _FakeWorkspaceClient:
+    def __init__(self, **kwargs) -> None:
+        self.kwargs = kwargs
+
+
+def _request(**state):
+    return SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(**state)))
+
+
+def test_get_user_ws_reuses_the_client_for_a_token(monkeypatch):
+    monkeypatch.setattr(core, "WorkspaceClient", _FakeWorkspaceClient)
+
+    first = get_user_ws(_request(), token="token-a")
+    second = get_user_ws(_request(), token="token-a")
+    other = get_user_ws(_request(), token="token-b")
+
+    assert first is second
+    assert other is not first
+    assert first.kwargs == {"token": "token-a", "auth_type": "pat"}
+    assert other.kwargs["token"] == "token-b"
+
+
+def test_get_user_ws_keys_clients_by_token_digest(monkeypatch):
+    monkeypatch.setattr(core, "WorkspaceClient", _FakeWorkspaceClient)
+
+    client = get_user_ws(_request(), token="secret-token")
+
+    assert core._user_client_cache.get("secret-token") is None
+    assert core._user_client_cache.get(hashlib.sha256(b"secret-token").hexdigest()) is client
+
+
+def test_get_user_ws_without_token_uses_the_app_client(monkeypatch):
+    monkeypatch.setattr(core, "WorkspaceClient", _FakeWorkspaceClient)
+    app_client = object()
+
+    assert get_user_ws(_request(workspace_client=app_client), token=None) is app_client
+    assert get_user_ws(_request(workspace_client=app_client), token="") is app_client
+    with pytest.raises(RuntimeError):
+        get_user_ws(_request(), token=None)
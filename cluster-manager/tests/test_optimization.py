@@ -0,0 +1,293 @@
+"""Tests for the optimization router."""
+
+import hashlib
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from databricks.sdk.service.compute import State
+
+from cluster_manager.backend.core import AppConfig
+from cluster_manager.backend.routers import optimization
+
+from .conftest import FakeClusters, FakeStatementExecution, FakeWorkspace, make_cluster
+
+
+def _large_workspace() -> FakeWorkspace:
+    """150 clusters where the 30 running ones come after 120 terminated ones."""
+    terminated = [make_cluster(f"t{i}", state=State.TERMINATED) for i in range(120)]
+    running = [make_cluster(f"r{i}") for i in range(30)]
+    return FakeWorkspace(terminated + running)
+
+
+def test_all_recommendations_matches_individual_endpoints_beyond_listing_limit(make_client):
+    client = make_client(_large_workspace())
+
+    spark = client.get("/api/optimization/spark-config-recommendations").json()
+    cost = client.get("/api/optimization/cost-recommendations").json()
+    autoscaling = client.get("/api/optimization/autoscaling-recommendations").json()
+    combined = client.get("/api/optimization/all-recommendations").json()
+
+    assert len(spark) == 30
+    assert len(cost) == 30
+    assert combined["spark"] == spark
+    assert combined["cost"] == cost
+    assert combined["autoscaling"] == autoscaling
+
+
+def test_all_recommendations_include_terminated_uses_unfiltered_listing(make_client):
+    client = make_client(_large_workspace())
+
+    spark = client.get(
+        "/api/optimization/spark-config-recommendations", params={"include_terminated": True}
+    ).json()
+    combined = client.get(
+        "/api/optimization/all-recommendations", params={"include_terminated": True}
+    ).json()
+
+    # The unfiltered listing stops at the 100-cluster limit, all of them terminated
+    assert len(spark) == 100
+    assert combined["spark"] == spark
+
+
+def test_analyzers_accept_clusters_fetched_outside_the_listing():
+    # e.g. a ws.clusters.get() result, which never passes through the listing cache
+    cluster = make_cluster("solo", num_workers=6)
+
+    cost = optimization._analyze_cluster_cost(cluster)
+    autoscaling = optimization._analyze_cluster_autoscaling(cluster)
+    node_type = optimization._analyze_cluster_node_type(cluster)
+
+    assert cost.cloud_provider == "aws"
+    assert cost.num_workers == 6
+    assert cost.total_recommendations > 0
+    assert autoscaling.current_workers == 6
+    assert autoscaling.total_issues > 0
+    assert node_type.num_workers == 6
+
+
+def test_summary_etag_round_trip(make_client):
+    client = make_client(FakeWorkspace([make_cluster("a"), make_cluster("b", num_workers=12)]))
+
+    first = client.get("/api/optimization/summary")
+    etag = first.headers["etag"]
+    assert first.status_code == 200
+    assert first.json()["total_clusters_analyzed"] == 2
+
+    cached = client.get("/api/optimization/summary", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+    assert cached.content == b""
+
+    stale = client.get("/api/optimization/summary", headers={"If-None-Match": 'W/"stale"'})
+    assert stale.status_code == 200
+
+
+def test_summary_etag_is_stable_across_processes(make_client):
+    # hash() is salted per process; the ETag must be a pure function of cluster data
+    client = make_client(FakeWorkspace([make_cluster("a")]))
+    fingerprint = repr([("a", "RUNNING", 8, None, None, 0)])
+    expected = hashlib.sha256(fingerprint.encode()).hexdigest()[:16]
+
+    assert client.get("/api/optimization/summary").headers["etag"] == f'W/"{expected}"'
+
+
+def test_spark_recommendation_order_ignores_conf_insertion_order():
+    conf = {
+        "spark.dynamicAllocation.enabled": "false",
+        "spark.databricks.delta.autoOptimize.enabled": "FALSE",
+        "spark.sql.shuffle.partitions": "5000",
+        "spark.sql.adaptive.skewJoin.enabled": "false",
+        "spark.sql.adaptive.enabled": "false",
+    }
+    forward = make_cluster("a", spark_conf=conf)
+    backward = make_cluster("a", spark_conf=dict(reversed(conf.items())))
+
+    settings = [
+        rec.setting for rec in optimization._analyze_cluster_spark_config(forward).recommendations
+    ]
+    assert settings == [
+        "spark.sql.adaptive.enabled",
+        "spark.sql.adaptive.skewJoin.enabled",
+        "spark.sql.shuffle.partitions",
+        "Runtime Version",
+        "spark.databricks.delta.autoOptimize.enabled",
+        "spark.dynamicAllocation.enabled",
+    ]
+    assert optimization._analyze_cluster_spark_config(backward) == (
+        optimization._analyze_cluster_spark_config(forward)
+    )
+
+
+def test_cluster_listing_callers_get_a_copy():
+    ws = FakeWorkspace([make_cluster("a"), make_cluster("b")])
+
+    first = optimization._list_clusters_limited(ws, limit=100)
+    first.sort(key=lambda c: c.cluster_id, reverse=True)
+    first.pop()
+    second = optimization._list_clusters_limited(ws, limit=100)
+
+    assert [c.cluster_id for c in second] == ["a", "b"]
+    assert ws.clusters.list_calls == 1
+
+
+def test_all_recommendations_returns_every_list(make_client):
+    client = make_client(FakeWorkspace([
+        make_cluster("issues"),
+        make_cluster("stopped", state=State.TERMINATED),
+    ]))
+
+    body = client.get("/api/optimization/all-recommendations").json()
+
+    assert set(body) == {"spark", "cost", "autoscaling"}
+    assert [a["cluster_id"] for a in body["spark"]] == ["issues"]
+    assert [a["cluster_id"] for a in body["cost"]] == ["issues"]
+    # Autoscaling looks at every cluster, not just active ones
+    assert {a["cluster_id"] for a in body["autoscaling"]} == {"issues", "stopped"}
+
+
+def test_ndjson_responses_stream_one_analysis_per_line(make_client):
+    clusters = [make_cluster(f"c{i}", num_workers=4 + i) for i in range(3)]
+    client = make_client(FakeWorkspace(clusters))
+
+    for path in (
+        "/api/optimization/autoscaling-recommendations",
+        "/api/optimization/node-type-recommendations",
+    ):
+        expected = client.get(path, params={"include_no_issues": True}).json()
+        response = client.get(
+            path, params={"include_no_issues": True}, headers={"Accept": "application/x-ndjson"}
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        assert response.text.endswith("\n")
+        lines = response.text.splitlines()
+        assert len(lines) == len(expected) == 3
+        assert [json.loads(line) for line in lines] == expected
+
+
+def test_ndjson_is_opt_in(make_client):
+    client = make_client(FakeWorkspace([make_cluster("a")]))
+
+    response = client.get("/api/optimization/autoscaling-recommendations")
+
+    assert response.headers["content-type"] == "application/json"
+    assert isinstance(response.json(), list)
+
+
+_HISTORY_COLUMNS = [
+    "cluster_id", "cluster_name", "metric_date", "cluster_type", "worker_count",
+    "potential_dbu_per_hour", "actual_dbu", "uptime_hours", "efficiency_score",
+    "job_run_count", "unique_users", "is_oversized", "is_underutilized",
+]
+
+
+def _history_row(cluster_id: str, day: str) -> list:
+    return [
+        cluster_id, f"cluster-{cluster_id}", f"{day}T00:00:00Z", "JOB", "4",
+        "5.0", "12.5", "6.0", "41.7", "3", None, "false", "true",
+    ]
+
+
+def test_cluster_histories_groups_rows_from_one_statement(make_client):
+    statements = FakeStatementExecution(_HISTORY_COLUMNS, [
+        _history_row("a", "2026-10-02"),
+        _history_row("a", "2026-10-01"),
+        _history_row("b", "2026-10-02"),
+    ])
+    client = make_client(
+        FakeWorkspace([], statement_execution=statements),
+        AppConfig(sql_warehouse_id="wh-1"),
+    )
+
+    response = client.post(
+        "/api/optimization/cluster-histories",
+        json={"cluster_ids": ["a", "b", "a", "missing"], "days": 7},
+    )
+
+    assert response.status_code == 200
+    histories = response.json()
+    assert list(histories) == ["a", "b", "missing"]
+    assert [m["metric_date"][:10] for m in histories["a"]] == ["2026-10-02", "2026-10-01"]
+    assert histories["a"][0]["efficiency_score"] == 41.7
+    assert histories["a"][0]["unique_users"] is None
+    assert len(histories["b"]) == 1
+    assert histories["missing"] == []
+
+    # One statement, with every cluster id and the window bound as parameters
+    assert len(statements.calls) == 1
+    call = statements.calls[0]
+    assert call["warehouse_id"] == "wh-1"
+    assert ":c0, :c1, :c2" in call["statement"]
+    assert {p.name: p.value for p in call["parameters"]} == {
+        "c0": "a", "c1": "b", "c2": "missing", "days": "7",
+    }
+
+
+def test_cluster_history_returns_every_row_like_the_bulk_endpoint(make_client):
+    # A duplicated day must not push the oldest day out of the window
+    rows = [
+        _history_row("a", "2026-10-02"),
+        _history_row("a", "2026-10-02"),
+        _history_row("a", "2026-10-01"),
+    ]
+    statements = FakeStatementExecution(_HISTORY_COLUMNS, rows)
+    client = make_client(
+        FakeWorkspace([], statement_execution=statements),
+        AppConfig(sql_warehouse_id="wh-1"),
+    )
+
+    single = client.get("/api/optimization/cluster/a/history", params={"days": 1}).json()
+    bulk = client.post(
+        "/api/optimization/cluster-histories", json={"cluster_ids": ["a"], "days": 1}
+    ).json()
+
+    assert single == bulk["a"]
+    assert [m["metric_date"][:10] for m in single] == ["2026-10-02", "2026-10-02", "2026-10-01"]
+    assert "LIMIT" not in statements.calls[0]["statement"]
+    assert {p.name: p.value for p in statements.calls[0]["parameters"]} == {
+        "cluster_id": "a", "days": "1",
+    }
+
+
+def test_cluster_histories_validates_request(make_client):
+    client = make_client(FakeWorkspace([]), AppConfig(sql_warehouse_id="wh-1"))
+
+    response = client.post("/api/optimization/cluster-histories", json={"cluster_ids": []})
+
+    assert response.status_code == 422
+
+
+class _BlockingClusters(FakeClusters):
+    """Clusters API whose unfiltered listing blocks until released."""
+
+    def __init__(self, clusters) -> None:
+        super().__init__(clusters)
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def list(self, filter_by=None, page_size=None):
+        if filter_by is None:
+            self.started.set()
+            assert self.release.wait(timeout=5)
+        return super().list(filter_by, page_size)
+
+
+def test_cluster_listing_misses_only_wait_on_the_same_key():
+    ws = FakeWorkspace([make_cluster("a"), make_cluster("b", state=State.TERMINATED)])
+    ws.clusters = _BlockingClusters(ws.clusters._clusters)
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        slow = [pool.submit(optimization._list_clusters_limited, ws, 100) for _ in range(2)]
+        assert ws.clusters.started.wait(timeout=5)
+
+        # A different state filter is not stuck behind the slow unfiltered listing
+        active = optimization._list_clusters_limited(ws, 100, optimization._ACTIVE_STATES)
+        assert [c.cluster_id for c in active] == ["a"]
+
+        ws.clusters.release.set()
+        assert all(len(f.result(timeout=5)) == 2 for f in slow)
+
+    # One call for the filtered listing, one shared by both unfiltered callers
+    assert ws.clusters.list_calls == 2
@@ -0,0 +1,109 @@
+"""Tests for the policies router."""
+
+from types import SimpleNamespace
+
+from databricks.sdk.service.compute import ListClustersFilterBy, Policy, State
+
+from cluster_manager.backend.routers import policies_router
+
+from .conftest import FakeClusters, make_cluster
+
+
+class _Policies:
+    def __init__(self, policies: list[Policy]) -> None:
+        self._policies = {p.policy_id: p for p in policies}
+        self._listing = policies
+
+    def list(self):
+        return iter(self._listing)
+
+    def get(self, policy_id: str) -> Policy:
+        return self._policies[policy_id]
+
+
+class _PolicyClusters(FakeClusters):
+    """Clusters API that also honours the policy_id filter and records it."""
+
+    def __init__(self, clusters) -> None:
+        super().__init__(clusters)
+        self.filters: list[ListClustersFilterBy] = []
+
+    def list(self, filter_by=None, page_size=None):
+        self.filters.append(filter_by)
+        clusters = super().list(filter_by, page_size)
+        if filter_by and filter_by.policy_id:
+            return (c for c in clusters if c.policy_id == filter_by.policy_id)
+        return clusters
+
+
+def _workspace(policies, clusters=()):
+    return SimpleNamespace(
+        config=SimpleNamespace(host="https://test.databricks.com"),
+        cluster_policies=_Policies(policies),
+        clusters=_PolicyClusters(list(clusters)),
+    )
+
+
+def test_list_policies_sorted_by_name(make_client):
+    ws = _workspace([
+        Policy(policy_id="p2", name="Zeta", created_at_timestamp=1_700_000_000_000),
+        Policy(policy_id="p1", name=None, is_default=True),
+    ])
+    client = make_client(ws, router=policies_router)
+
+    body = client.get("/api/policies").json()
+
+    assert [p["name"] for p in body] == ["Unnamed Policy", "Zeta"]
+    assert body[0]["is_default"] is True
+    assert body[1]["is_default"] is False
+    assert body[1]["created_at_timestamp"].startswith("2023-11-14T22:13:20")
+
+
+def test_list_policies_rejects_policies_without_id(make_client):
+    ws = _workspace([Policy(policy_id=None, name="Broken")])
+    client = make_client(ws, router=policies_router)
+
+    # A policy without an id cannot satisfy the schema; fail loudly instead of emitting null
+    assert client.get("/api/policies").status_code == 500
+
+
+def test_policy_usage_filters_by_policy_server_side(make_client):
+    clusters = [
+        make_cluster("a", policy_id="p1", autoscale=(1, 4)),
+        make_cluster("b", policy_id="p2"),
+        make_cluster("c", policy_id="p1", state=State.TERMINATED),
+    ]
+    ws = _workspace([Policy(policy_id="p1", name="Jobs")], clusters)
+    client = make_client(ws, router=policies_router)
+
+    body = client.get("/api/policies/p1/usage").json()
+
+    assert ws.clusters.filters == [ListClustersFilterBy(policy_id="p1")]
+    assert body["policy_name"] == "Jobs"
+    assert body["cluster_count"] == 2
+    by_id = {c["cluster_id"]: c for c in body["clusters"]}
+    assert by_id["a"]["autoscale"] == {"min_workers": 1, "max_workers": 4}
+    assert by_id["a"]["state"] == "RUNNING"
+    assert by_id["a"]["cluster_source"] == "UI"
+    assert by_id["c"]["state"] == "TERMINATED"
+
+
+def test_policy_usage_rejects_clusters_without_id(make_client):
+    clusters = [make_cluster("a", policy_id="p1")]
+    clusters[0].cluster_id = None
+    ws = _workspace([Policy(policy_id="p1", name="Jobs")], clusters)
+    client = make_client(ws, router=policies_router)
+
+    assert client.get("/api/policies/p1/usage").status_code == 500
+
+
+def test_get_policy_parse_definition_flag(make_client):
+    ws = _workspace([Policy(policy_id="p1", name="Jobs", definition='{"spark_version": {}}')])
+    client = make_client(ws, router=policies_router)
+
+    parsed = client.get("/api/policies/p1").json()
+    raw = client.get("/api/policies/p1", params={"parse_definition": False}).json()
+
+    assert parsed["definition_json"] == {"spark_version": {}}
+    assert raw["definition_json"] == {}
+    assert raw["definition"] == '{"spark_version": {}}'